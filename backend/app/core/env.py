@@ -0,0 +1,19 @@
+"""
+Process-wide environment loading
+"""
+
+import functools
+import os
+import pathlib
+from dotenv import load_dotenv
+
+# .env lives in the project root, three levels above this package
+ENV_FILE = pathlib.Path(__file__).resolve().parents[3] / '.env'
+
+@functools.lru_cache(maxsize=1)
+def ensure_env():
+    """Load .env once per process; forked workers inherit the flag and skip the parse"""
+    if os.getenv('_ENV_LOADED'):
+        return
+    load_dotenv(ENV_FILE)
+    os.environ['_ENV_LOADED'] = '1'
@@ -14,13 +14,18 @@ logger = logging.getLogger(__name__)
 security = HTTPBearer()
 
 async def get_current_user(credentials: HTTPAuthorizationCredentials = Depends(security)):
-    """Verify Firebase token and return user info"""
+    """
+    Verify Firebase token and return user info
+    
+    Decoded tokens and user profiles are cached by firebase_service, so a
+    profile change made through invalidate_user is seen on the next request.
+    """
     try:
         token = credentials.credentials
         user_info = await verify_firebase_token(token)
         return user_info
     except Exception as e:
-        logger.error(f"Token verification failed: {str(e)}")
+        logger.error("Token verification failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication token"
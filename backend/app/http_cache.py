@@ -0,0 +1,52 @@
+"""
+HTTP caching helpers (ETag / Cache-Control)
+"""
+
+import hashlib
+import json
+from typing import Any, Optional
+
+from fastapi import Request, Response
+from pydantic import BaseModel
+
+def make_etag(data: Any) -> str:
+    """Build a strong ETag from JSON-serializable data"""
+    body = json.dumps(data, sort_keys=True, default=str).encode()
+    return '"' + hashlib.blake2b(body, digest_size=16).hexdigest() + '"'
+
+def etag_matches(if_none_match: Optional[str], etag: str) -> bool:
+    """Check an If-None-Match header against an ETag (weak comparison, lists and *)"""
+    if not if_none_match:
+        return False
+    if if_none_match.strip() == "*":
+        return True
+    return any(
+        candidate.strip().removeprefix("W/") == etag
+        for candidate in if_none_match.split(",")
+    )
+
+def cached_response(
+    request: Request,
+    response: Response,
+    result: BaseModel,
+    max_age: int,
+    etag_data: Optional[Any] = None
+):
+    """
+    Attach ETag and Cache-Control headers to a route result
+
+    Returns a bare 304 response when the client already holds the
+    current representation (If-None-Match), otherwise the result itself.
+    """
+    etag = make_etag(result.model_dump(mode="json") if etag_data is None else etag_data)
+    cache_control = f"private, max-age={max_age}"
+    
+    if etag_matches(request.headers.get("if-none-match"), etag):
+        return Response(
+            status_code=304,
+            headers={"ETag": etag, "Cache-Control": cache_control}
+        )
+    
+    response.headers["ETag"] = etag
+    response.headers["Cache-Control"] = cache_control
+    return result
@@ -5,16 +5,20 @@ Main application entry point
 
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
+from fastapi.responses import ORJSONResponse
 import logging
-import pathlib
-from dotenv import load_dotenv
+import os
+from contextlib import asynccontextmanager
 
+from .core.env import ensure_env
 from .routers import auth, website, campaign, analytics
 from .models.responses import HealthResponse
+from .services.meta_ads_service import close_meta_ads_service
+from .services.firebase_service import firebase_service
+from .services.website_service import website_service
 
 # Load environment variables from project root
-project_root = pathlib.Path(__file__).parent.parent.parent
-load_dotenv(project_root / '.env')
+ensure_env()
 
 # Configure logging
 logging.basicConfig(
@@ -23,13 +27,23 @@ logging.basicConfig(
 )
 logger = logging.getLogger(__name__)
 
+@asynccontextmanager
+async def lifespan(app: FastAPI):
+    """Release pooled outbound HTTP connections and flush pending audit events on shutdown"""
+    yield
+    await close_meta_ads_service()
+    await firebase_service.close()
+    await website_service.close()
+
 # Initialize FastAPI app
 app = FastAPI(
     title="MarkezardAI API",
     description="AI-powered marketing campaign generation and management",
     version="1.0.0",
     docs_url="/docs",
-    redoc_url="/redoc"
+    redoc_url="/redoc",
+    default_response_class=ORJSONResponse,
+    lifespan=lifespan
 )
 
 # Configure CORS
@@ -37,8 +51,10 @@ app.add_middleware(
     CORSMiddleware,
     allow_origins=["http://localhost:3000", "http://127.0.0.1:3000"],
     allow_credentials=True,
-    allow_methods=["*"],
-    allow_headers=["*"],
+    allow_methods=["GET", "POST", "OPTIONS"],
+    allow_headers=["authorization", "content-type", "if-none-match"],
+    expose_headers=["etag"],
+    max_age=86400,
 )
 
 # Include routers
@@ -64,4 +80,11 @@ async def root():
 
 if __name__ == "__main__":
     import uvicorn
-    uvicorn.run(app, host="0.0.0.0", port=8000, reload=True)
+    uvicorn.run(
+        "app.main:app",
+        host="0.0.0.0",
+        port=8000,
+        loop="uvloop",
+        http="httptools",
+        workers=os.cpu_count()
+    )
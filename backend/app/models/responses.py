@@ -101,13 +101,13 @@ class CampaignPublishResponse(BaseModel):
 
 # Analytics
 class CampaignMetrics(BaseModel):
-    impressions: int
-    clicks: int
-    conversions: int
-    spend: float
-    ctr: float
-    cpc: float
-    roas: float
+    impressions: int = 0
+    clicks: int = 0
+    conversions: int = 0
+    spend: float = 0.0
+    ctr: float = 0.0
+    cpc: float = 0.0
+    roas: float = 0.0
 
 class CampaignAnalyticsResponse(BaseModel):
     campaign_id: str
@@ -40,7 +40,7 @@ async def verify_token(request: TokenVerificationRequest):
     except HTTPException:
         raise
     except Exception as e:
-        logger.error(f"Token verification failed: {str(e)}")
+        logger.error("Token verification failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_401_UNAUTHORIZED,
             detail="Invalid authentication token"
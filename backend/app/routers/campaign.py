@@ -2,14 +2,15 @@
 Campaign generation and publishing router
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status, Request
+from fastapi import APIRouter, HTTPException, Depends, status, Request, BackgroundTasks
+from fastapi.responses import ORJSONResponse
 import logging
 from datetime import datetime
 
 from ..models.requests import CampaignGenerationRequest, CampaignPublishRequest
 from ..models.responses import CampaignGenerationResponse, CampaignPublishResponse, CampaignDraft, AdVariation, UntappedInterest
 from ..services.ai_service import call_gemini, GeminiConfig
-from ..services.meta_ads_service import meta_ads_service
+from ..services.meta_ads_service import get_meta_ads_service
 from ..services.firebase_service import firebase_service
 from ..dependencies import get_current_user
 
@@ -17,32 +18,18 @@ logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
-@router.post("/generate-campaign", response_model=CampaignGenerationResponse)
-async def generate_campaign(
-    request: CampaignGenerationRequest,
-    current_user: dict = Depends(get_current_user)
-):
-    """
-    Generate campaign using Gemini AI with untapped interests
-    """
-    try:
-        logger.info(f"Generating campaign for platform: {request.platform}")
-        
-        product = request.product
-        platform = request.platform.value
-        budget = request.budget
-        language = request.language
-        goal = request.goal.value
-        
-        # Construct campaign generation prompt
-        prompt = f"""
+# Generation settings, shared across requests
+_CAMPAIGN_CFG = GeminiConfig(temperature=0.8, max_tokens=2500)
+
+# Prompt templates, filled in per request with str.format
+_CAMPAIGN_PROMPT = """
         Generate a comprehensive advertising campaign for this product:
         
         Product Details:
-        - Name: {product.get('name', 'Unknown Product')}
-        - Description: {product.get('description', 'No description')}
-        - Price: ${product.get('price', 0)} {product.get('currency', 'USD')}
-        - Category: {product.get('category', 'General')}
+        - Name: {name}
+        - Description: {description}
+        - Price: ${price} {currency}
+        - Category: {category}
         
         Campaign Parameters:
         - Platform: {platform}
@@ -87,17 +74,46 @@ async def generate_campaign(
         - Provide detailed reasoning for each interest
         - Make copy compelling and platform-appropriate
         """
+
+@router.post("/generate-campaign", response_model=CampaignGenerationResponse, response_class=ORJSONResponse)
+async def generate_campaign(
+    request: CampaignGenerationRequest,
+    current_user: dict = Depends(get_current_user)
+):
+    """
+    Generate campaign using Gemini AI with untapped interests
+    """
+    try:
+        logger.info("Generating campaign for platform: %s", request.platform)
+        
+        product = request.product
+        platform = request.platform.value
+        budget = request.budget
+        language = request.language
+        goal = request.goal.value
+        
+        # Construct campaign generation prompt
+        prompt = _CAMPAIGN_PROMPT.format(
+            name=product.get('name', 'Unknown Product'),
+            description=product.get('description', 'No description'),
+            price=product.get('price', 0),
+            currency=product.get('currency', 'USD'),
+            category=product.get('category', 'General'),
+            platform=platform,
+            budget=budget,
+            language=language,
+            goal=goal
+        )
         
         # Call Gemini AI
-        config = GeminiConfig(temperature=0.8, max_tokens=2500)
         try:
             campaign_result = await call_gemini(
                 prompt=prompt,
-                config=config,
+                config=_CAMPAIGN_CFG,
                 structured_output=True
             )
         except Exception as e:
-            logger.error(f"Gemini AI call failed: {str(e)}")
+            logger.error("Gemini AI call failed: %s", e)
             raise HTTPException(
                 status_code=status.HTTP_503_SERVICE_UNAVAILABLE,
                 detail="AI service temporarily unavailable"
@@ -108,15 +124,17 @@ async def generate_campaign(
             try:
                 primary_copy = AdVariation(**campaign_result["primary_copy"])
                 
-                variations = []
-                for var_data in campaign_result.get("variations", []):
-                    variations.append(AdVariation(**var_data))
+                variations = [
+                    AdVariation(**var_data)
+                    for var_data in campaign_result.get("variations", [])
+                ]
                 
-                untapped_interests = []
-                for interest_data in campaign_result.get("untapped_interests", []):
-                    untapped_interests.append(UntappedInterest(**interest_data))
+                untapped_interests = [
+                    UntappedInterest(**interest_data)
+                    for interest_data in campaign_result.get("untapped_interests", [])
+                ]
             except Exception as e:
-                logger.error(f"Failed to parse campaign result: {str(e)}")
+                logger.error("Failed to parse campaign result: %s", e)
                 raise HTTPException(
                     status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
                     detail="Failed to parse AI response"
@@ -131,7 +149,7 @@ async def generate_campaign(
             )
             
             # Add budget and platform info to draft
-            campaign_draft_dict = campaign_draft.dict()
+            campaign_draft_dict = campaign_draft.model_dump(mode="json")
             campaign_draft_dict.update({
                 "budget": {"daily_budget": budget},
                 "platform": platform,
@@ -184,7 +202,7 @@ async def generate_campaign(
             )
         
     except Exception as e:
-        logger.error(f"Campaign generation failed: {str(e)}")
+        logger.error("Campaign generation failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Campaign generation failed: {str(e)}"
@@ -194,13 +212,14 @@ async def generate_campaign(
 async def publish_campaign(
     request: CampaignPublishRequest,
     http_request: Request,
+    background_tasks: BackgroundTasks,
     current_user: dict = Depends(get_current_user)
 ):
     """
     Publish campaign to advertising platform
     """
     try:
-        logger.info(f"Publishing campaign to {request.platform} (mode: {request.publish_mode})")
+        logger.info("Publishing campaign to %s (mode: %s)", request.platform, request.publish_mode)
         
         platform = request.platform.value
         publish_mode = request.publish_mode.value
@@ -216,6 +235,7 @@ async def publish_campaign(
             "user_agent": http_request.headers.get("user-agent", "unknown")
         }
         
+        # Queue the attempt audit event; it is written in the background
         audit_log_id = await firebase_service.log_audit_event(
             user_id=current_user["uid"],
             event_type="campaign_publish_attempt",
@@ -224,7 +244,7 @@ async def publish_campaign(
         
         # Route to appropriate platform service
         if platform == "meta":
-            platform_response = await meta_ads_service.publish_campaign(
+            platform_response = await get_meta_ads_service().publish_campaign(
                 campaign_draft=campaign_draft,
                 publish_mode=publish_mode,
                 confirm_token=confirm_token
@@ -238,12 +258,12 @@ async def publish_campaign(
                 "details": {"mock_mode": True}
             }
         
-        # Update audit log with result
-        audit_details["result"] = platform_response["status"]
-        await firebase_service.log_audit_event(
+        # Record the result after the response is sent; the client does not wait on it
+        background_tasks.add_task(
+            firebase_service.log_audit_event,
             user_id=current_user["uid"],
             event_type="campaign_publish_result",
-            details=audit_details
+            details={**audit_details, "result": platform_response["status"]}
         )
         
         return CampaignPublishResponse(
@@ -253,7 +273,7 @@ async def publish_campaign(
         )
         
     except Exception as e:
-        logger.error(f"Campaign publishing failed: {str(e)}")
+        logger.error("Campaign publishing failed: %s", e)
         
         # Log error in audit
         try:
@@ -2,19 +2,95 @@
 Website integration and analysis router
 """
 
-from fastapi import APIRouter, HTTPException, Depends, status
+from fastapi import APIRouter, HTTPException, Depends, status, Request, Response
+from fastapi.responses import ORJSONResponse
 import logging
+from itertools import islice
+from typing import Any, Dict, List
+from cachetools import TTLCache
 
 from ..models.requests import WebsiteIntegrationRequest, WebsiteAnalysisRequest, PlatformSuggestionsRequest
 from ..models.responses import WebsiteIntegrationResponse, WebsiteAnalysisResponse, PlatformSuggestionsResponse
 from ..services.website_service import website_service
 from ..services.ai_service import call_gemini, GeminiConfig
 from ..dependencies import get_current_user
+from ..http_cache import cached_response
 
 logger = logging.getLogger(__name__)
 
 router = APIRouter()
 
+# Generation settings, shared across requests
+_ANALYSE_CFG = GeminiConfig(temperature=0.7, max_tokens=1500)
+_SUGGEST_CFG = GeminiConfig(temperature=0.6, max_tokens=1200)
+
+# Prompt templates, filled in per request with str.format
+_ANALYSE_PROMPT = """
+        Analyze this e-commerce website and provide insights:
+        
+        Website: {title}
+        Description: {description}
+        
+        Products ({product_count} total):
+        {product_lines}
+        
+        Please provide a JSON response with:
+        {{
+            "strengths": ["strength1", "strength2", ...],
+            "weaknesses": ["weakness1", "weakness2", ...],
+            "improvement_suggestions": ["suggestion1", "suggestion2", ...],
+            "product_positioning": "detailed positioning analysis"
+        }}
+        """
+
+_SUGGESTIONS_PROMPT = """
+        Analyze the best advertising platforms for this product type: {product_type}
+        
+        Consider factors like:
+        - Target audience demographics
+        - Platform reach and engagement
+        - Cost effectiveness
+        - Ad format suitability
+        - Competition levels
+        
+        Provide a JSON response with platform suggestions:
+        {{
+            "suggestions": [
+                {{
+                    "platform": "Meta",
+                    "score": 85,
+                    "rationale": "Excellent targeting options and visual ad formats",
+                    "estimated_reach": 2500000,
+                    "cost_effectiveness": "high"
+                }},
+                ...
+            ]
+        }}
+        
+        Include platforms: Meta, Google, TikTok, LinkedIn, X (Twitter)
+        Score each platform 0-100 based on suitability.
+        """
+
+# Successful Gemini suggestions by product type; the prompt depends on nothing else
+_SUGGESTIONS_CACHE = TTLCache(maxsize=512, ttl=600)
+
+def _build_analyse_prompt(site_meta: Dict[str, Any], products: List[Dict[str, Any]]) -> str:
+    """
+    Build the website analysis prompt
+    
+    Only the product count and the first five products are read, so the
+    cost is bounded regardless of catalogue size and it runs inline.
+    """
+    return _ANALYSE_PROMPT.format(
+        title=site_meta.get('title', 'Unknown'),
+        description=site_meta.get('description', 'No description'),
+        product_count=len(products),
+        product_lines="\n".join(
+            f"- {p.get('name', 'Unknown')}: {p.get('description', 'No description')[:100]}..."
+            for p in islice(products, 5)
+        )
+    )
+
 @router.post("/integrate-website", response_model=WebsiteIntegrationResponse)
 async def integrate_website(
     request: WebsiteIntegrationRequest,
@@ -24,7 +100,7 @@ async def integrate_website(
     Integrate with a website and extract products and metadata
     """
     try:
-        logger.info(f"Integrating website: {request.url} (platform: {request.platform})")
+        logger.info("Integrating website: %s (platform: %s)", request.url, request.platform)
         
         result = await website_service.integrate_website(
             platform=request.platform.value,
@@ -32,17 +108,17 @@ async def integrate_website(
             oauth=request.oauth
         )
         
-        logger.info(f"Successfully integrated website: {len(result.products)} products found")
+        logger.info("Successfully integrated website: %d products found", len(result.products))
         return result
         
     except Exception as e:
-        logger.error(f"Website integration failed: {str(e)}")
+        logger.error("Website integration failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Website integration failed: {str(e)}"
         )
 
-@router.post("/analyse-website", response_model=WebsiteAnalysisResponse)
+@router.post("/analyse-website", response_model=WebsiteAnalysisResponse, response_class=ORJSONResponse)
 async def analyse_website(
     request: WebsiteAnalysisRequest,
     current_user: dict = Depends(get_current_user)
@@ -58,29 +134,12 @@ async def analyse_website(
         products = site_data.get("products", [])
         site_meta = site_data.get("site_meta", {})
         
-        prompt = f"""
-        Analyze this e-commerce website and provide insights:
-        
-        Website: {site_meta.get('title', 'Unknown')}
-        Description: {site_meta.get('description', 'No description')}
-        
-        Products ({len(products)} total):
-        {chr(10).join([f"- {p.get('name', 'Unknown')}: {p.get('description', 'No description')[:100]}..." for p in products[:5]])}
-        
-        Please provide a JSON response with:
-        {{
-            "strengths": ["strength1", "strength2", ...],
-            "weaknesses": ["weakness1", "weakness2", ...],
-            "improvement_suggestions": ["suggestion1", "suggestion2", ...],
-            "product_positioning": "detailed positioning analysis"
-        }}
-        """
+        prompt = _build_analyse_prompt(site_meta, products)
         
         # Call Gemini AI
-        config = GeminiConfig(temperature=0.7, max_tokens=1500)
         analysis_result = await call_gemini(
             prompt=prompt,
-            config=config,
+            config=_ANALYSE_CFG,
             structured_output=True
         )
         
@@ -101,7 +160,7 @@ async def analyse_website(
             )
         
     except Exception as e:
-        logger.error(f"Website analysis failed: {str(e)}")
+        logger.error("Website analysis failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Website analysis failed: {str(e)}"
@@ -109,6 +168,8 @@ async def analyse_website(
 
 @router.get("/platform-suggestions", response_model=PlatformSuggestionsResponse)
 async def get_platform_suggestions(
+    request: Request,
+    response: Response,
     product_type: str = None,
     current_user: dict = Depends(get_current_user)
 ):
@@ -116,52 +177,33 @@ async def get_platform_suggestions(
     Get platform suggestions based on product type
     """
     try:
-        logger.info(f"Getting platform suggestions for product type: {product_type}")
-        
-        # Construct platform analysis prompt
-        prompt = f"""
-        Analyze the best advertising platforms for this product type: {product_type or 'general e-commerce products'}
-        
-        Consider factors like:
-        - Target audience demographics
-        - Platform reach and engagement
-        - Cost effectiveness
-        - Ad format suitability
-        - Competition levels
+        logger.info("Getting platform suggestions for product type: %s", product_type)
         
-        Provide a JSON response with platform suggestions:
-        {{
-            "suggestions": [
-                {{
-                    "platform": "Meta",
-                    "score": 85,
-                    "rationale": "Excellent targeting options and visual ad formats",
-                    "estimated_reach": 2500000,
-                    "cost_effectiveness": "high"
-                }},
-                ...
-            ]
-        }}
+        cache_key = product_type or "__none__"
+        cached = _SUGGESTIONS_CACHE.get(cache_key)
+        if cached is not None:
+            return cached_response(request, response, cached, max_age=300)
         
-        Include platforms: Meta, Google, TikTok, LinkedIn, X (Twitter)
-        Score each platform 0-100 based on suitability.
-        """
+        # Construct platform analysis prompt
+        prompt = _SUGGESTIONS_PROMPT.format(
+            product_type=product_type or 'general e-commerce products'
+        )
         
         # Call Gemini AI
-        config = GeminiConfig(temperature=0.6, max_tokens=1200)
         suggestions_result = await call_gemini(
             prompt=prompt,
-            config=config,
+            config=_SUGGEST_CFG,
             structured_output=True
         )
         
         if isinstance(suggestions_result, dict) and "suggestions" in suggestions_result:
-            return PlatformSuggestionsResponse(
+            result = PlatformSuggestionsResponse(
                 suggestions=suggestions_result["suggestions"]
             )
+            _SUGGESTIONS_CACHE[cache_key] = result
         else:
             # Fallback suggestions
-            return PlatformSuggestionsResponse(
+            result = PlatformSuggestionsResponse(
                 suggestions=[
                     {
                         "platform": "Meta",
@@ -187,8 +229,10 @@ async def get_platform_suggestions(
                 ]
             )
         
+        return cached_response(request, response, result, max_age=300)
+        
     except Exception as e:
-        logger.error(f"Platform suggestions failed: {str(e)}")
+        logger.error("Platform suggestions failed: %s", e)
         raise HTTPException(
             status_code=status.HTTP_500_INTERNAL_SERVER_ERROR,
             detail=f"Platform suggestions failed: {str(e)}"
@@ -3,26 +3,62 @@ Gemini AI service with key rotation and structured output parsing
 """
 
 import os
+import array
+import collections
 import json
 import random
+import re
 import time
 import logging
-import pathlib
-from typing import Dict, Any, List, Optional, Union
+from typing import Dict, Any, List, Optional, Tuple, Union
 import asyncio
 from dataclasses import dataclass
-from dotenv import load_dotenv
 
 import google.generativeai as genai
+import google.ai.generativelanguage as glm
+from google.api_core.client_options import ClientOptions
 from google.generativeai.types import HarmCategory, HarmBlockThreshold
 
+from ..core.env import ensure_env
+
 # Ensure environment variables are loaded
-project_root = pathlib.Path(__file__).parent.parent.parent.parent
-load_dotenv(project_root / '.env')
+ensure_env()
 
 logger = logging.getLogger(__name__)
 
-@dataclass
+# Markdown code fence around a JSON reply, e.g. ```json ... ```
+_JSON_FENCE = re.compile(r"\A\s*```(?:json)?\n?|\n?```\s*\Z")
+_DECODER = json.JSONDecoder()
+
+# Seconds a key stays out of rotation after a failure
+RATE_LIMIT_COOLDOWN = 30.0
+INVALID_KEY_COOLDOWN = float("inf")
+
+# Decorrelated-jitter retry delays, in seconds
+RETRY_BASE_DELAY = 0.1
+RETRY_MAX_DELAY = 20.0
+
+# In-flight calls allowed per API key
+PER_KEY_INFLIGHT = 4
+
+def _retry_after(error: Exception) -> Optional[float]:
+    """Server-suggested retry delay in seconds, if the error carries one"""
+    try:
+        response = getattr(error, "response", None)
+        headers = getattr(response, "headers", None)
+        if headers and headers.get("retry-after"):
+            return float(headers["retry-after"])
+        
+        # gRPC errors carry a google.rpc.RetryInfo detail instead
+        for detail in getattr(error, "details", None) or ():
+            retry_delay = getattr(detail, "retry_delay", None)
+            if retry_delay is not None:
+                return retry_delay.seconds + retry_delay.nanos / 1e9
+    except (TypeError, ValueError, AttributeError):
+        pass
+    return None
+
+@dataclass(frozen=True, slots=True)
 class GeminiConfig:
     model: str = "gemini-pro"
     max_tokens: int = 2048
@@ -30,12 +66,24 @@ class GeminiConfig:
     top_p: float = 0.8
     top_k: int = 40
 
+_DEFAULT_CFG = GeminiConfig()
+
+# One GenerationConfig per distinct GeminiConfig, shared by every call
+_GEN_CFG_CACHE: Dict[GeminiConfig, genai.types.GenerationConfig] = {}
+
 class GeminiService:
     def __init__(self):
         self.api_keys = self._load_api_keys()
-        self.current_key_index = 0
-        self.key_usage_count = {}
-        self.failed_keys = set()
+        # Fixed-size per-key counters, indexed by key position
+        self.key_usage_count = array.array('Q', [0] * len(self.api_keys))
+        # Round-robin order of key indices, and when each failed key may be used again
+        self._healthy = collections.deque(range(len(self.api_keys)))
+        self._cooldown_until = array.array('d', [0.0] * len(self.api_keys))
+        # Per-key concurrency limit, and calls holding or waiting for each key's slots
+        self._key_sems = [asyncio.Semaphore(PER_KEY_INFLIGHT) for _ in self.api_keys]
+        self._inflight = [0] * len(self.api_keys)
+        self._clients: Dict[str, glm.GenerativeServiceAsyncClient] = {}
+        self._models: Dict[Tuple[str, str], genai.GenerativeModel] = {}
         self._configure_safety_settings()
     
     def _load_api_keys(self) -> List[str]:
@@ -45,12 +93,12 @@ class GeminiService:
             key = os.getenv(f'GEMINI_API_KEY_{i}')
             if key:
                 keys.append(key)
-                logger.info(f"✅ Loaded Gemini API key {i}")
+                logger.info("✅ Loaded Gemini API key %d", i)
         
         if not keys:
             raise ValueError("No Gemini API keys found. At least GEMINI_API_KEY_1 is required for production mode.")
         
-        logger.info(f"✅ Gemini AI service initialized with {len(keys)} API keys")
+        logger.info("✅ Gemini AI service initialized with %d API keys", len(keys))
         return keys
     
     def _configure_safety_settings(self):
@@ -62,39 +110,96 @@ class GeminiService:
             HarmCategory.HARM_CATEGORY_DANGEROUS_CONTENT: HarmBlockThreshold.BLOCK_MEDIUM_AND_ABOVE,
         }
     
-    def _get_next_api_key(self) -> Optional[str]:
-        """Get next available API key using round-robin"""
+    def _get_client(self, api_key: str) -> glm.GenerativeServiceAsyncClient:
+        """
+        Get the async client for an API key, creating it on first use
+        
+        Created lazily so the gRPC channel binds to the running event loop;
+        one channel per key is then reused by every call made with that key.
+        """
+        client = self._clients.get(api_key)
+        if client is None:
+            client = glm.GenerativeServiceAsyncClient(
+                client_options=ClientOptions(api_key=api_key)
+            )
+            self._clients[api_key] = client
+        return client
+    
+    def _get_model(self, api_key: str, model_name: str) -> genai.GenerativeModel:
+        """Get the cached model for an API key, creating it on first use"""
+        cache_key = (api_key, model_name)
+        model = self._models.get(cache_key)
+        if model is None:
+            model = genai.GenerativeModel(
+                model_name=model_name,
+                safety_settings=self.safety_settings
+            )
+            # Bind the model to this key's own client instead of the global default.
+            # _async_client is private to google-generativeai and this relies on
+            # the pinned 0.3.2, where generate_content_async only falls back to
+            # the default client while it is None; re-check it on any SDK bump.
+            # Fail loudly rather than silently calling under the wrong key.
+            if not hasattr(model, '_async_client'):
+                raise RuntimeError("Unsupported google-generativeai version: GenerativeModel has no _async_client")
+            model._async_client = self._get_client(api_key)
+            self._models[cache_key] = model
+        return model
+    
+    def _get_generation_config(self, config: GeminiConfig) -> genai.types.GenerationConfig:
+        """Get the cached GenerationConfig for a GeminiConfig"""
+        generation_config = _GEN_CFG_CACHE.get(config)
+        if generation_config is None:
+            generation_config = genai.types.GenerationConfig(
+                max_output_tokens=config.max_tokens,
+                temperature=config.temperature,
+                top_p=config.top_p,
+                top_k=config.top_k,
+            )
+            _GEN_CFG_CACHE[config] = generation_config
+        return generation_config
+    
+    def _get_next_api_key(self) -> Optional[Tuple[int, str]]:
+        """Get (index, key) of the available API key with the fewest calls in flight, round-robin among ties"""
         if not self.api_keys:
             return None
         
-        # Get available keys (not failed)
-        available_indices = [i for i in range(len(self.api_keys)) if i not in self.failed_keys]
-        if not available_indices:
-            # Reset failed keys if all have failed
-            logger.warning("All API keys failed, resetting failed keys list")
-            self.failed_keys.clear()
-            available_indices = list(range(len(self.api_keys)))
+        now = time.monotonic()
+        selected_index = None
+        for index in self._healthy:
+            if now < self._cooldown_until[index]:
+                continue
+            if selected_index is None or self._inflight[index] < self._inflight[selected_index]:
+                selected_index = index
         
-        # Round-robin selection from available indices
-        selected_index = available_indices[self.current_key_index % len(available_indices)]
-        self.current_key_index = (self.current_key_index + 1) % len(available_indices)
+        if selected_index is None:
+            # Every key is cooling down: end the temporary cooldowns, but keys
+            # rejected as invalid stay out of rotation for good
+            cooldowns = self._cooldown_until
+            for index, until in enumerate(cooldowns):
+                if until != INVALID_KEY_COOLDOWN:
+                    cooldowns[index] = 0.0
+            selected_index = next((index for index in self._healthy if cooldowns[index] == 0.0), None)
+            if selected_index is None:
+                logger.error("All Gemini API keys are invalid")
+                return None
+            logger.warning("All Gemini API keys are cooling down, resetting rate-limit cooldowns")
+        
+        # Move the chosen key to the back so equally loaded keys take turns
+        self._healthy.remove(selected_index)
+        self._healthy.append(selected_index)
         
         key = self.api_keys[selected_index]
         
         # Track usage
-        self.key_usage_count[selected_index] = self.key_usage_count.get(selected_index, 0) + 1
+        self.key_usage_count[selected_index] += 1
         
-        logger.info(f"Using Gemini API key {selected_index + 1} (usage: {self.key_usage_count[selected_index]})")
-        return key
+        logger.info("Using Gemini API key %d (usage: %d)", selected_index + 1, self.key_usage_count[selected_index])
+        return selected_index, key
     
-    def _mark_key_failed(self, api_key: str):
-        """Mark an API key as failed"""
-        try:
-            key_index = self.api_keys.index(api_key)
-            self.failed_keys.add(key_index)
-            logger.warning(f"Marked Gemini API key {key_index + 1} as failed")
-        except ValueError:
-            pass
+    def _mark_key_failed(self, key_index: int, cooldown: float = RATE_LIMIT_COOLDOWN):
+        """Take the API key at `key_index` out of rotation for `cooldown` seconds"""
+        self._cooldown_until[key_index] = time.monotonic() + cooldown
+        logger.warning("Marked Gemini API key %d as failed", key_index + 1)
     
     async def call_gemini(
         self,
@@ -115,44 +220,39 @@ class GeminiService:
         Returns:
             String response or parsed JSON dict
         """
-        if config is None:
-            config = GeminiConfig()
+        config = config or _DEFAULT_CFG
         
         last_error = None
+        delay = RETRY_BASE_DELAY
         
         for attempt in range(retry_count):
-            api_key = self._get_next_api_key()
-            if not api_key:
+            selected = self._get_next_api_key()
+            if selected is None:
                 raise RuntimeError("No available Gemini API keys")
+            key_index, api_key = selected
             
             try:
-                # Configure the API key
-                genai.configure(api_key=api_key)
-                
-                # Create model
-                model = genai.GenerativeModel(
-                    model_name=config.model,
-                    safety_settings=self.safety_settings
-                )
+                model = self._get_model(api_key, config.model)
                 
-                # Generate content
-                response = await asyncio.to_thread(
-                    model.generate_content,
-                    prompt,
-                    generation_config=genai.types.GenerationConfig(
-                        max_output_tokens=config.max_tokens,
-                        temperature=config.temperature,
-                        top_p=config.top_p,
-                        top_k=config.top_k,
-                    )
-                )
+                # Generate content on the event loop via the async gRPC client,
+                # within this key's share of the concurrency budget
+                self._inflight[key_index] += 1
+                try:
+                    async with self._key_sems[key_index]:
+                        response = await model.generate_content_async(
+                            prompt,
+                            generation_config=self._get_generation_config(config)
+                        )
+                finally:
+                    self._inflight[key_index] -= 1
                 
-                if response.text:
-                    result = response.text.strip()
+                # response.text re-walks the candidate parts on every access, so read it once
+                result = response.text
+                if result:
                     logger.info("✅ Gemini AI response generated successfully")
                     
                     if structured_output:
-                        return self._parse_structured_output(result)
+                        return self._parse_structured_output(result.strip())
                     return result
                 else:
                     raise Exception("Empty response from Gemini")
@@ -163,52 +263,60 @@ class GeminiService:
                 
                 # Check for quota/rate limit errors
                 if "quota" in error_msg or "429" in error_msg or "rate limit" in error_msg:
-                    self._mark_key_failed(api_key)
-                    logger.warning(f"Quota/rate limit hit for key, trying next key: {str(e)}")
+                    self._mark_key_failed(key_index)
+                    logger.warning("Quota/rate limit hit for key, trying next key: %s", e)
                     continue
                 
-                # Exponential backoff for transient errors
+                # Invalid keys stay out of rotation
+                if "401" in error_msg or "api key not valid" in error_msg:
+                    self._mark_key_failed(key_index, cooldown=INVALID_KEY_COOLDOWN)
+                    logger.warning("Invalid API key, trying next key: %s", e)
+                    continue
+                
+                # Decorrelated-jitter backoff for transient errors, unless the server says when to retry
                 if attempt < retry_count - 1:
-                    wait_time = (2 ** attempt) + random.uniform(0, 1)
-                    logger.warning(f"Gemini API error (attempt {attempt + 1}), retrying in {wait_time:.2f}s: {str(e)}")
+                    wait_time = _retry_after(e)
+                    if wait_time is None:
+                        delay = min(RETRY_MAX_DELAY, random.uniform(RETRY_BASE_DELAY, delay * 3))
+                        wait_time = delay
+                    else:
+                        wait_time = min(RETRY_MAX_DELAY, wait_time)
+                    logger.warning("Gemini API error (attempt %d), retrying in %.2fs: %s", attempt + 1, wait_time, e)
                     await asyncio.sleep(wait_time)
                     continue
                 
-                logger.error(f"Gemini API call failed: {str(e)}")
+                logger.error("Gemini API call failed: %s", e)
                 break
         
         # If all retries failed, raise error instead of mock response
-        logger.error(f"All Gemini API attempts failed. Last error: {last_error}")
+        logger.error("All Gemini API attempts failed. Last error: %s", last_error)
         raise RuntimeError(f"Gemini AI service failed after {retry_count} attempts: {last_error}")
     
     def _parse_structured_output(self, response: str) -> Dict[str, Any]:
         """Parse structured JSON output from Gemini response"""
+        # Happy path: the reply is already a bare JSON object
+        if response.startswith('{'):
+            try:
+                return _DECODER.decode(response)
+            except json.JSONDecodeError:
+                pass
+        
         try:
-            # Try to find JSON in the response
-            response = response.strip()
-            
             # Remove markdown code blocks if present
-            if response.startswith("```json"):
-                response = response[7:]
-            if response.startswith("```"):
-                response = response[3:]
-            if response.endswith("```"):
-                response = response[:-3]
+            response = _JSON_FENCE.sub("", response)
             
-            # Find JSON object
+            # Decode the first JSON object; raw_decode stops at its closing brace
             start_idx = response.find('{')
-            end_idx = response.rfind('}') + 1
-            
-            if start_idx >= 0 and end_idx > start_idx:
-                json_str = response[start_idx:end_idx]
-                return json.loads(json_str)
+            if start_idx >= 0:
+                result, _ = _DECODER.raw_decode(response, start_idx)
+                return result
             else:
                 # Try parsing the entire response
                 return json.loads(response)
                 
         except json.JSONDecodeError as e:
-            logger.error(f"Failed to parse structured output: {str(e)}")
-            logger.error(f"Response was: {response[:500]}...")
+            logger.error("Failed to parse structured output: %s", e)
+            logger.error("Response was: %.500s...", response)
             
             # Return a basic structure
             return {
@@ -4,26 +4,78 @@ Firebase Authentication and Firestore service
 
 import json
 import os
+import hashlib
 import logging
-import pathlib
-from typing import Dict, Any, Optional
+import re
+import uuid
+import asyncio
+import time
+from typing import Dict, Any, List, Optional, Tuple
 from datetime import datetime
-from dotenv import load_dotenv
+from cachetools import TTLCache
 
 import firebase_admin
-from firebase_admin import credentials, auth, firestore
+from firebase_admin import credentials, auth, firestore_async
+from google.api_core.exceptions import AlreadyExists
 from fastapi import HTTPException, status
 
+from ..core.env import ensure_env
+
 # Ensure environment variables are loaded
-project_root = pathlib.Path(__file__).parent.parent.parent.parent
-load_dotenv(project_root / '.env')
+ensure_env()
 
 logger = logging.getLogger(__name__)
 
+# Audit events are written in batches; Firestore allows 500 writes per commit
+AUDIT_BATCH_SIZE = 500
+AUDIT_FLUSH_INTERVAL = 1.0
+AUDIT_QUEUE_SIZE = 10_000
+
+# Decoded ID tokens are reused until shortly before they expire (Firebase tokens live one hour)
+TOKEN_CACHE_SIZE = 10_000
+TOKEN_CACHE_TTL = 3600
+TOKEN_EXPIRY_MARGIN = 30
+
+# User profiles are read-mostly; plan changes must call invalidate_user
+USER_CACHE_SIZE = 50_000
+USER_CACHE_TTL = 300
+
+# Control characters other than tab, newline and carriage return
+_CTRL_RE = re.compile(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]')
+
+def _clean_service_account_json(service_account_json: str) -> Dict[str, Any]:
+    """Parse the service account JSON, unescaping it once if it was stored escaped"""
+    logger.debug(f"Raw JSON length: {len(service_account_json)}")
+    
+    # Strip whitespace and BOM
+    service_account_json = service_account_json.strip().strip('\ufeff')
+    
+    try:
+        service_account_info = json.loads(service_account_json)
+        # Keys pasted through shell or .env quoting can keep their newlines as literal \\n
+        private_key = service_account_info.get('private_key')
+        if isinstance(private_key, str) and '\\n' in private_key:
+            service_account_info['private_key'] = private_key.replace('\\n', '\n')
+        return service_account_info
+    except json.JSONDecodeError:
+        pass
+    
+    # Otherwise the value was escaped once more (e.g. {\"type\": ...}); undo that and drop stray control characters
+    service_account_json = _CTRL_RE.sub('', service_account_json.encode().decode('unicode_escape'))
+    logger.debug(f"Unescaped JSON length: {len(service_account_json)}")
+    
+    return json.loads(service_account_json)
+
 class FirebaseService:
     def __init__(self):
         self.app = None
         self.db = None
+        self._audit_q: Optional[asyncio.Queue] = None
+        self._audit_worker: Optional[asyncio.Task] = None
+        # Keyed by a digest of the raw token so tokens themselves are not retained
+        self._tok_cache: TTLCache = TTLCache(maxsize=TOKEN_CACHE_SIZE, ttl=TOKEN_CACHE_TTL)
+        self._user_cache: TTLCache = TTLCache(maxsize=USER_CACHE_SIZE, ttl=USER_CACHE_TTL)
+        self._user_fetches: Dict[str, asyncio.Task] = {}
         self._initialize_firebase()
     
     def _initialize_firebase(self):
@@ -35,36 +87,8 @@ class FirebaseService:
         logger.info("Initializing Firebase with production credentials...")
         
         try:
-            # Parse service account JSON - handle all escape sequences and control characters
-            logger.debug(f"Raw JSON length: {len(service_account_json)}")
-            
-            # Clean the JSON string by removing/replacing problematic characters
-            # First, strip whitespace and BOM
-            service_account_json = service_account_json.strip().strip('\ufeff')
-            
-            # Handle escape sequences in a more robust way
-            # Use Python's built-in string decoding for proper handling
-            try:
-                # Try to decode escape sequences using Python's string_escape codec equivalent
-                service_account_json = service_account_json.encode().decode('unicode_escape')
-            except (UnicodeDecodeError, AttributeError):
-                # Fallback to manual replacement if decode fails
-                service_account_json = service_account_json.replace('\\\\n', '\n')
-                service_account_json = service_account_json.replace('\\\\r', '\r')
-                service_account_json = service_account_json.replace('\\\\t', '\t')
-                service_account_json = service_account_json.replace('\\n', '\n')
-                service_account_json = service_account_json.replace('\\r', '\r')
-                service_account_json = service_account_json.replace('\\t', '\t')
-            
-            # Remove any remaining control characters that might cause JSON parsing issues
-            import re
-            # Remove control characters except newlines, carriage returns, and tabs
-            service_account_json = re.sub(r'[\x00-\x08\x0b\x0c\x0e-\x1f\x7f]', '', service_account_json)
-            
-            logger.debug(f"Cleaned JSON length: {len(service_account_json)}")
-            
-            # Try to parse the JSON
-            service_account_info = json.loads(service_account_json)
+            # Parse service account JSON
+            service_account_info = _clean_service_account_json(service_account_json)
             
             # Validate required fields
             required_fields = ['type', 'project_id', 'private_key', 'client_email']
@@ -84,8 +108,8 @@ class FirebaseService:
                 self.app = firebase_admin.get_app()
                 logger.info("✅ Using existing Firebase app")
             
-            # Initialize Firestore
-            self.db = firestore.client()
+            # Initialize Firestore with the asyncio client so reads and writes don't block the event loop
+            self.db = firestore_async.client()
             logger.info("✅ Firestore client connected successfully")
             
         except json.JSONDecodeError as e:
@@ -104,8 +128,13 @@ class FirebaseService:
             raise RuntimeError("Firebase is not initialized. Cannot verify tokens.")
         
         try:
-            # Verify the ID token with Firebase
-            decoded_token = auth.verify_id_token(id_token)
+            # Verify the ID token with Firebase, unless it was verified recently
+            token_key = hashlib.blake2b(id_token.encode(), digest_size=16).digest()
+            decoded_token = self._tok_cache.get(token_key)
+            if decoded_token is None or decoded_token.get('exp', 0) <= time.time() + TOKEN_EXPIRY_MARGIN:
+                # Signature checks are CPU-bound and may fetch signing keys, so keep them off the event loop
+                decoded_token = await asyncio.to_thread(auth.verify_id_token, id_token)
+                self._tok_cache[token_key] = decoded_token
             uid = decoded_token['uid']
             email = decoded_token.get('email', '')
             name = decoded_token.get('name', '')
@@ -129,22 +158,33 @@ class FirebaseService:
         if not self.db:
             raise RuntimeError("Firestore is not initialized. Cannot access user profiles.")
         
+        profile = self._user_cache.get(uid)
+        if profile is not None:
+            return profile
+        
+        # Concurrent misses for the same user share one Firestore lookup
+        fetch = self._user_fetches.get(uid)
+        if fetch is None:
+            fetch = asyncio.create_task(self._fetch_user_profile(uid, email, name))
+            self._user_fetches[uid] = fetch
+            fetch.add_done_callback(lambda _: self._user_fetches.pop(uid, None))
+        
+        profile = await asyncio.shield(fetch)
+        self._user_cache[uid] = profile
+        return profile
+    
+    def invalidate_user(self, uid: str):
+        """Drop a cached user profile, e.g. after its plan changes"""
+        self._user_cache.pop(uid, None)
+    
+    async def _fetch_user_profile(self, uid: str, email: str, name: str) -> Dict[str, Any]:
+        """Read the user profile from Firestore, creating it on first login"""
         try:
             # Check if user exists in Firestore
             user_ref = self.db.collection('users').document(uid)
-            user_doc = user_ref.get()
+            user_doc = await user_ref.get()
             
-            if user_doc.exists:
-                user_data = user_doc.to_dict()
-                logger.info(f"✅ Retrieved existing user profile for: {email}")
-                return {
-                    "uid": uid,
-                    "email": email,
-                    "name": name,
-                    "plan": user_data.get("plan", "free"),
-                    "created_at": user_data.get("created_at")
-                }
-            else:
+            if not user_doc.exists:
                 # Create new user profile in Firestore
                 user_data = {
                     "email": email,
@@ -154,27 +194,51 @@ class FirebaseService:
                     "campaigns_created": 0,
                     "last_login": datetime.utcnow()
                 }
-                user_ref.set(user_data)
-                logger.info(f"✅ Created new user profile for: {email}")
-                
-                return {
-                    "uid": uid,
-                    "email": email,
-                    "name": name,
-                    "plan": "free",
-                    "created_at": user_data["created_at"].isoformat()
-                }
+                try:
+                    # create() fails instead of overwriting if a concurrent login got there first
+                    await user_ref.create(user_data)
+                    logger.info(f"✅ Created new user profile for: {email}")
+                    
+                    return {
+                        "uid": uid,
+                        "email": email,
+                        "name": name,
+                        "plan": "free",
+                        "created_at": user_data["created_at"].isoformat()
+                    }
+                except AlreadyExists:
+                    user_doc = await user_ref.get()
+            
+            user_data = user_doc.to_dict()
+            logger.info(f"✅ Retrieved existing user profile for: {email}")
+            return {
+                "uid": uid,
+                "email": email,
+                "name": name,
+                "plan": user_data.get("plan", "free"),
+                "created_at": user_data.get("created_at")
+            }
                 
         except Exception as e:
             logger.error(f"Firestore operation failed: {str(e)}")
             raise RuntimeError(f"Failed to access user profile in Firestore: {str(e)}")
     
     async def log_audit_event(self, user_id: str, event_type: str, details: Dict[str, Any]) -> str:
-        """Log audit event to Firestore - PRODUCTION MODE ONLY"""
+        """
+        Queue an audit event for Firestore - PRODUCTION MODE ONLY
+        
+        Events are written in the background by _flush_audits; the returned
+        ID is generated client-side and becomes the Firestore document ID.
+        """
         if not self.db:
             raise RuntimeError("Firestore is not initialized. Cannot log audit events.")
         
+        if self._audit_worker is None or self._audit_worker.done():
+            self._audit_q = asyncio.Queue(maxsize=AUDIT_QUEUE_SIZE)
+            self._audit_worker = asyncio.create_task(self._flush_audits())
+        
         try:
+            audit_id = uuid.uuid4().hex
             audit_data = {
                 "user_id": user_id,
                 "event_type": event_type,
@@ -183,14 +247,62 @@ class FirebaseService:
                 "ip_address": details.get("ip_address", "unknown")
             }
             
-            doc_ref = self.db.collection('audit_logs').add(audit_data)
-            audit_id = doc_ref[1].id
-            logger.info(f"✅ Audit event logged: {event_type} for user {user_id}")
+            self._audit_q.put_nowait((audit_id, audit_data))
+            logger.info(f"✅ Audit event queued: {event_type} for user {user_id}")
             return audit_id
             
+        except asyncio.QueueFull:
+            logger.error(f"Audit queue full, dropping event: {event_type} for user {user_id}")
+            raise RuntimeError("Failed to log audit event to Firestore: audit queue is full")
+    
+    async def _flush_audits(self):
+        """Collect queued audit events and commit them in batches until a stop marker arrives"""
+        loop = asyncio.get_running_loop()
+        while True:
+            item = await self._audit_q.get()
+            if item is None:
+                return
+            buffer = [item]
+            deadline = loop.time() + AUDIT_FLUSH_INTERVAL
+            stop = False
+            
+            while len(buffer) < AUDIT_BATCH_SIZE:
+                timeout = deadline - loop.time()
+                if timeout <= 0:
+                    break
+                try:
+                    item = await asyncio.wait_for(self._audit_q.get(), timeout)
+                except asyncio.TimeoutError:
+                    break
+                if item is None:
+                    stop = True
+                    break
+                buffer.append(item)
+            
+            await self._commit_audits(buffer)
+            if stop:
+                return
+    
+    async def _commit_audits(self, buffer: List[Tuple[str, Dict[str, Any]]]):
+        """Write a batch of audit events in a single Firestore commit"""
+        try:
+            collection = self.db.collection('audit_logs')
+            batch = self.db.batch()
+            for audit_id, audit_data in buffer:
+                batch.set(collection.document(audit_id), audit_data)
+            await batch.commit()
+            logger.info(f"✅ Logged {len(buffer)} audit events")
         except Exception as e:
-            logger.error(f"Failed to log audit event: {str(e)}")
-            raise RuntimeError(f"Failed to log audit event to Firestore: {str(e)}")
+            logger.error(f"Failed to log {len(buffer)} audit events: {str(e)}")
+    
+    async def close(self):
+        """Flush queued audit events and stop the background writer"""
+        if self._audit_worker is None or self._audit_worker.done():
+            return
+        # Wait for room rather than dropping the stop marker when the queue is full
+        await self._audit_q.put(None)
+        await self._audit_worker
+        self._audit_worker = None
 
 # Global instance
 firebase_service = FirebaseService()
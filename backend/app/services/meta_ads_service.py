@@ -3,37 +3,234 @@ Meta Ads API service with dry-run safety
 """
 
 import os
-import json
+import sys
 import logging
-import pathlib
-from typing import Dict, Any, Optional, List
-from datetime import datetime, timedelta
+import random
+import time
+from typing import Dict, Any, Optional, List, Tuple
 import hashlib
-from dotenv import load_dotenv
+import functools
+from dataclasses import dataclass
+from itertools import islice
+from types import MappingProxyType
+from urllib.parse import quote_plus, urlencode
 
 import aiohttp
 import asyncio
+import orjson
+
+from ..core.env import ensure_env
 
 # Ensure environment variables are loaded
-project_root = pathlib.Path(__file__).parent.parent.parent.parent
-load_dotenv(project_root / '.env')
+ensure_env()
 
 logger = logging.getLogger(__name__)
 
+# Insights query shared by single and batched analytics lookups
+ANALYTICS_FIELDS = "impressions,clicks,spend,conversions,ctr,cpc"
+ANALYTICS_DATE_PRESET = "last_7_days"
+
+# Seconds a successful /me probe is trusted before dry runs probe again
+CONNECTION_CHECK_TTL = 60.0
+
+# Outbound request cap and 429 handling
+MAX_CONCURRENT_REQUESTS = 8
+RATE_LIMIT_RETRIES = 2
+RATE_LIMIT_BASE_DELAY = 0.5
+RATE_LIMIT_MAX_DELAY = 10.0
+
+# Graph API accepts at most 50 sub-requests per batch
+MAX_BATCH_SIZE = 50
+
+# Keys shared by every parsed analytics result
+_ANALYTICS_STATIC = MappingProxyType({
+    "platform": "meta",
+    "data_source": "live"
+})
+
+# Static part of every create payload; the access token is added per request
+_BASE_CAMPAIGN_FIELDS = MappingProxyType({
+    "status": "PAUSED"  # Start paused for safety
+})
+_BASE_ADSET_FIELDS = MappingProxyType({
+    "billing_event": "IMPRESSIONS",
+    "optimization_goal": "CONVERSIONS",
+    "status": "PAUSED"
+})
+_BASE_AD_FIELDS = MappingProxyType({
+    "status": "PAUSED"
+})
+
+# Create calls send orjson-encoded bodies; other requests stay form-encoded
+_JSON_HEADERS = MappingProxyType({"Content-Type": "application/json"})
+
+# Campaign goal -> Meta Ads objective
+_OBJECTIVE_MAP = MappingProxyType({
+    "awareness": "BRAND_AWARENESS",
+    "traffic": "LINK_CLICKS",
+    "conversions": "CONVERSIONS",
+    "leads": "LEAD_GENERATION"
+})
+
+# CTA keyword -> Meta Ads CTA type, checked in order so shopping CTAs win
+_CTA_KEYWORDS = (
+    ("shop", "SHOP_NOW"),
+    ("buy", "SHOP_NOW"),
+    ("learn", "LEARN_MORE"),
+    ("sign", "SIGN_UP")
+)
+
+def _iso_now() -> str:
+    """Current UTC time as an ISO 8601 string, formatted without building a datetime"""
+    seconds, nanos = divmod(time.time_ns(), 1_000_000_000)
+    return time.strftime("%Y-%m-%dT%H:%M:%S", time.gmtime(seconds)) + f".{nanos // 1000:06d}"
+
+@functools.lru_cache(maxsize=4096)
+def _stable_id(value: str) -> str:
+    """Deterministic short ID for a string, identical across processes (unlike hash())"""
+    return hashlib.blake2b(value.encode(), digest_size=8).hexdigest()
+
+def _batch_body(fields: Dict[str, Any]) -> str:
+    """Form-encode a batch sub-request body, leaving {result=...} references raw for Graph to resolve"""
+    parts = []
+    for key, value in fields.items():
+        if isinstance(value, dict):
+            # Nested objects (targeting, creative) travel as JSON strings in form bodies
+            value = orjson.dumps(value).decode()
+        elif isinstance(value, str) and value.startswith("{result="):
+            parts.append(f"{key}={value}")
+            continue
+        parts.append(f"{key}={quote_plus(str(value))}")
+    return "&".join(parts)
+
+@functools.lru_cache(maxsize=4096)
+def _reach(daily_budget: float) -> int:
+    """Estimated daily reach for a daily budget"""
+    # Simple estimation: $1 = ~100 reach
+    return int(daily_budget * 100)
+
+@functools.lru_cache(maxsize=64)
+def _audience_size(n_interests: int) -> int:
+    """Estimated targeting audience size for a number of interests"""
+    base_size = 1000000  # 1M base
+    
+    # Reduce size based on number of interests (more specific = smaller audience)
+    if n_interests:
+        reduction_factor = max(0.1, 1 - (n_interests * 0.1))
+        base_size = int(base_size * reduction_factor)
+    
+    return base_size
+
+@dataclass(frozen=True, slots=True)
+class AdCopy:
+    headline: str = ""
+    description: str = ""
+    cta: str = "LEARN_MORE"
+    
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "AdCopy":
+        return cls(
+            headline=raw.get("headline", ""),
+            description=raw.get("description", ""),
+            cta=raw.get("cta", "LEARN_MORE")
+        )
+
+@dataclass(frozen=True, slots=True)
+class PublishDraft:
+    """The campaign draft fields publishing reads, parsed once per publish"""
+    name: str = ""
+    goal: str = "conversions"
+    primary_copy: Optional[AdCopy] = None
+    variations: Tuple[AdCopy, ...] = ()
+    daily_budget: Optional[float] = None
+    interests: Tuple[str, ...] = ()
+    
+    @classmethod
+    def from_dict(cls, raw: Dict[str, Any]) -> "PublishDraft":
+        primary_copy = raw.get("primary_copy")
+        return cls(
+            name=raw.get("name") or "",
+            goal=raw.get("goal", "conversions"),
+            primary_copy=AdCopy.from_dict(primary_copy) if primary_copy else None,
+            variations=tuple(AdCopy.from_dict(variation) for variation in raw.get("variations", [])),
+            daily_budget=raw.get("budget", {}).get("daily_budget"),
+            # Interest names recur across drafts, so keep one copy of each
+            interests=tuple(sys.intern(interest.get("interest", "")) for interest in raw.get("untapped_interests", []))
+        )
+
 class MetaAdsService:
     def __init__(self):
         self.access_token = os.getenv('META_ACCESS_TOKEN')
         self.ad_account_id = os.getenv('META_AD_ACCOUNT_ID')
         self.base_url = "https://graph.facebook.com/v18.0"
         self.session_timeout = 30
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._conn_ok_until: float = 0.0
+        self._sem: Optional[asyncio.Semaphore] = None
+        # Publish campaign, ad set and ads in one Graph batch request instead of step by step
+        self.batch_publish = os.getenv('META_BATCH_PUBLISH', 'false').lower() in ('1', 'true', 'yes')
         
         if not self.access_token:
             raise ValueError("META_ACCESS_TOKEN environment variable is required for production mode")
         if not self.ad_account_id:
             raise ValueError("META_AD_ACCOUNT_ID environment variable is required for production mode")
         
+        # Endpoints never change per call
+        account_url = f"{self.base_url}/{self.ad_account_id}"
+        self._campaigns_url = f"{account_url}/campaigns"
+        self._adsets_url = f"{account_url}/adsets"
+        self._ads_url = f"{account_url}/ads"
+        
         logger.info(f"✅ Meta Ads service initialized for account: {self.ad_account_id}")
     
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared keep-alive HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.session_timeout),
+                # Keep pooled graph.facebook.com connections warm between publish steps
+                connector=aiohttp.TCPConnector(limit=100, ttl_dns_cache=300, keepalive_timeout=75)
+            )
+        return self._session
+    
+    async def _request(self, method: str, url: str, **kwargs) -> Tuple[int, bytes]:
+        """
+        Send one Graph API request and return its status and raw body
+        
+        At most MAX_CONCURRENT_REQUESTS run at once across the service; a 429
+        is retried up to RATE_LIMIT_RETRIES times, honouring Retry-After. The
+        body is read inside the response so the connection returns to the
+        pool before the caller parses it.
+        """
+        if self._sem is None:
+            self._sem = asyncio.Semaphore(MAX_CONCURRENT_REQUESTS)
+        session = await self._get_session()
+        
+        for attempt in range(RATE_LIMIT_RETRIES + 1):
+            async with self._sem:
+                async with session.request(method, url, **kwargs) as response:
+                    status = response.status
+                    raw = await response.read()
+                    retry_after = response.headers.get("Retry-After")
+            
+            if status != 429 or attempt == RATE_LIMIT_RETRIES:
+                return status, raw
+            
+            # Back off outside the semaphore so other requests keep flowing
+            try:
+                wait_time = float(retry_after)
+            except (TypeError, ValueError):
+                wait_time = RATE_LIMIT_BASE_DELAY * 2 ** attempt
+            wait_time = min(RATE_LIMIT_MAX_DELAY, wait_time) + random.uniform(0, RATE_LIMIT_BASE_DELAY)
+            logger.warning(f"Meta Ads API rate limited, retrying in {wait_time:.2f}s")
+            await asyncio.sleep(wait_time)
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
+    
     async def publish_campaign(
         self,
         campaign_draft: Dict[str, Any],
@@ -70,10 +267,13 @@ class MetaAdsService:
                         "details": {"error_code": "INVALID_CONFIRM_TOKEN"}
                     }
             
+            draft = PublishDraft.from_dict(campaign_draft)
             if publish_mode == "dry_run":
-                return await self._dry_run_publish(campaign_draft)
+                return await self._dry_run_publish(draft)
+            elif self.batch_publish:
+                return await self._live_publish_batch(draft)
             else:
-                return await self._live_publish(campaign_draft)
+                return await self._live_publish(draft)
                 
         except Exception as e:
             logger.error(f"Meta Ads publishing failed: {str(e)}")
@@ -84,11 +284,11 @@ class MetaAdsService:
                 "details": {"error": str(e)}
             }
     
-    async def _dry_run_publish(self, campaign_draft: Dict[str, Any]) -> Dict[str, Any]:
+    async def _dry_run_publish(self, draft: PublishDraft) -> Dict[str, Any]:
         """Perform dry run validation without actual publishing"""
         try:
             # Validate campaign structure
-            validation_errors = self._validate_campaign_draft(campaign_draft)
+            validation_errors = self._validate_campaign_draft(draft)
             if validation_errors:
                 return {
                     "platform": "meta",
@@ -97,18 +297,6 @@ class MetaAdsService:
                     "details": {"errors": validation_errors}
                 }
             
-            # Additional validation for required fields
-            if not campaign_draft.get("name"):
-                validation_errors.append("Campaign name is required")
-            
-            if validation_errors:
-                return {
-                    "platform": "meta",
-                    "status": "validation_failed", 
-                    "message": "Campaign validation failed",
-                    "details": {"errors": validation_errors}
-                }
-            
             # Test API connectivity
             if await self._test_api_connection():
                 return {
@@ -117,9 +305,9 @@ class MetaAdsService:
                     "status": "dry_run_success",
                     "message": "Campaign validated successfully - ready for live publishing",
                     "details": {
-                        "estimated_daily_reach": self._estimate_reach(campaign_draft),
-                        "estimated_daily_spend": campaign_draft.get("budget", {}).get("daily_budget", 0),
-                        "targeting_audience_size": self._estimate_audience_size(campaign_draft),
+                        "estimated_daily_reach": self._estimate_reach(draft),
+                        "estimated_daily_spend": draft.daily_budget or 0,
+                        "targeting_audience_size": self._estimate_audience_size(draft),
                         "validation_passed": True
                     }
                 }
@@ -140,11 +328,11 @@ class MetaAdsService:
                 "details": {"error": str(e)}
             }
     
-    async def _live_publish(self, campaign_draft: Dict[str, Any]) -> Dict[str, Any]:
+    async def _live_publish(self, draft: PublishDraft) -> Dict[str, Any]:
         """Publish campaign live to Meta Ads"""
         try:
             # Create campaign
-            campaign_response = await self._create_campaign(campaign_draft)
+            campaign_response = await self._create_campaign(draft)
             if not campaign_response.get("success"):
                 return {
                     "platform": "meta",
@@ -156,7 +344,7 @@ class MetaAdsService:
             campaign_id = campaign_response["id"]
             
             # Create ad set
-            adset_response = await self._create_ad_set(campaign_id, campaign_draft)
+            adset_response = await self._create_ad_set(campaign_id, draft)
             if not adset_response.get("success"):
                 return {
                     "platform": "meta",
@@ -168,7 +356,7 @@ class MetaAdsService:
             adset_id = adset_response["id"]
             
             # Create ads
-            ads_response = await self._create_ads(adset_id, campaign_draft)
+            ads_response = await self._create_ads(adset_id, draft)
             if not ads_response.get("success"):
                 return {
                     "platform": "meta",
@@ -186,7 +374,7 @@ class MetaAdsService:
                     "campaign_id": campaign_id,
                     "adset_id": adset_id,
                     "ad_ids": ads_response.get("ad_ids", []),
-                    "published_at": datetime.utcnow().isoformat()
+                    "published_at": _iso_now()
                 }
             }
             
@@ -199,119 +387,223 @@ class MetaAdsService:
                 "details": {"error": str(e)}
             }
     
-    async def _create_campaign(self, campaign_draft: Dict[str, Any]) -> Dict[str, Any]:
-        """Create Meta Ads campaign"""
-        url = f"{self.base_url}/{self.ad_account_id}/campaigns"
-        
-        campaign_data = {
-            "name": campaign_draft.get("name", "MarkezardAI Campaign"),
-            "objective": self._map_objective(campaign_draft.get("goal", "conversions")),
-            "status": "PAUSED",  # Start paused for safety
-            "access_token": self.access_token
-        }
+    async def _live_publish_batch(self, draft: PublishDraft) -> Dict[str, Any]:
+        """
+        Publish campaign live to Meta Ads in a single Graph batch request
         
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-            async with session.post(url, data=campaign_data) as response:
-                result = await response.json()
-                if response.status == 200 and result.get("id"):
-                    return {"success": True, "id": result["id"]}
-                else:
-                    return {"success": False, "error": result}
-    
-    async def _create_ad_set(self, campaign_id: str, campaign_draft: Dict[str, Any]) -> Dict[str, Any]:
-        """Create Meta Ads ad set"""
-        url = f"{self.base_url}/{self.ad_account_id}/adsets"
+        The ad set and ads reference the IDs created earlier in the same batch
+        via {result=name:$.id}, so the whole chain costs one round trip.
+        Enabled with META_BATCH_PUBLISH; failures map onto the same statuses
+        as the step-by-step publish.
+        """
+        try:
+            account = self.ad_account_id
+            batch = [
+                {
+                    "method": "POST",
+                    "relative_url": f"{account}/campaigns",
+                    "body": _batch_body(self._campaign_payload(draft)),
+                    "name": "campaign",
+                    "omit_response_on_success": False  # Referenced results are omitted by default
+                },
+                {
+                    "method": "POST",
+                    "relative_url": f"{account}/adsets",
+                    "body": _batch_body(self._adset_payload("{result=campaign:$.id}", draft)),
+                    "name": "adset",
+                    "omit_response_on_success": False
+                }
+            ]
+            batch.extend(
+                {
+                    "method": "POST",
+                    "relative_url": f"{account}/ads",
+                    "body": _batch_body(self._ad_payload("{result=adset:$.id}", ad_copy, name_suffix))
+                }
+                for ad_copy, name_suffix in self._ad_copies(draft)
+            )
+            
+            status, raw = await self._request(
+                "POST",
+                f"{self.base_url}/",
+                data={"access_token": self.access_token, "batch": orjson.dumps(batch).decode()}
+            )
+            
+            if status != 200:
+                raise RuntimeError(f"Meta Ads API error {status}: {raw.decode(errors='replace')}")
+            campaign_reply, adset_reply, *ad_replies = (
+                self._parse_batch_create(reply) for reply in orjson.loads(raw)
+            )
+            
+            if not campaign_reply.get("success"):
+                return {
+                    "platform": "meta",
+                    "status": "campaign_creation_failed",
+                    "message": "Failed to create campaign",
+                    "details": campaign_reply
+                }
+            
+            if not adset_reply.get("success"):
+                return {
+                    "platform": "meta",
+                    "status": "adset_creation_failed",
+                    "message": "Failed to create ad set",
+                    "details": adset_reply
+                }
+            
+            ad_ids = [reply["id"] for reply in ad_replies if reply.get("success")]
+            if not ad_ids:
+                return {
+                    "platform": "meta",
+                    "status": "ads_creation_failed",
+                    "message": "Failed to create ads",
+                    "details": {"success": False, "error": "No ads created successfully"}
+                }
+            
+            campaign_id = campaign_reply["id"]
+            return {
+                "platform": "meta",
+                "campaign_id": campaign_id,
+                "status": "live_published",
+                "message": "Campaign published successfully",
+                "details": {
+                    "campaign_id": campaign_id,
+                    "adset_id": adset_reply["id"],
+                    "ad_ids": ad_ids,
+                    "published_at": _iso_now()
+                }
+            }
+            
+        except Exception as e:
+            logger.error(f"Live publishing failed: {str(e)}")
+            return {
+                "platform": "meta",
+                "status": "error",
+                "message": f"Live publishing failed: {str(e)}",
+                "details": {"error": str(e)}
+            }
+    
+    def _parse_batch_create(self, reply: Optional[Dict[str, Any]]) -> Dict[str, Any]:
+        """Turn one batch sub-response into a create result like _create_object's"""
+        if not reply:
+            # Graph returns null for operations it did not get to within the timeout
+            return {"success": False, "error": "timeout"}
         
-        targeting = self._build_targeting(campaign_draft)
-        budget = campaign_draft.get("budget", {})
+        result = orjson.loads(reply.get("body") or "{}")
+        if reply.get("code") == 200 and result.get("id"):
+            return {"success": True, "id": result["id"]}
+        else:
+            return {"success": False, "error": result}
+    
+    def _campaign_payload(self, draft: PublishDraft) -> Dict[str, Any]:
+        """Campaign create fields (without the access token)"""
+        return {
+            **_BASE_CAMPAIGN_FIELDS,
+            "name": draft.name or "MarkezardAI Campaign",
+            "objective": self._map_objective(draft.goal)
+        }
+    
+    def _adset_payload(self, campaign_id: str, draft: PublishDraft) -> Dict[str, Any]:
+        """Ad set create fields (without the access token)"""
+        targeting = self._build_targeting(draft)
+        daily_budget = draft.daily_budget if draft.daily_budget is not None else 1000
         
-        adset_data = {
-            "name": f"{campaign_draft.get('name', 'Campaign')} - Ad Set",
+        return {
+            **_BASE_ADSET_FIELDS,
+            "name": f"{draft.name or 'Campaign'} - Ad Set",
             "campaign_id": campaign_id,
-            "daily_budget": int(budget.get("daily_budget", 1000) * 100),  # Convert to cents
-            "billing_event": "IMPRESSIONS",
-            "optimization_goal": "CONVERSIONS",
-            "targeting": json.dumps(targeting),
-            "status": "PAUSED",
-            "access_token": self.access_token
+            "daily_budget": int(daily_budget * 100),  # Convert to cents
+            "targeting": targeting
         }
-        
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-            async with session.post(url, data=adset_data) as response:
-                result = await response.json()
-                if response.status == 200 and result.get("id"):
-                    return {"success": True, "id": result["id"]}
-                else:
-                    return {"success": False, "error": result}
-    
-    async def _create_ads(self, adset_id: str, campaign_draft: Dict[str, Any]) -> Dict[str, Any]:
-        """Create Meta Ads"""
-        url = f"{self.base_url}/{self.ad_account_id}/ads"
-        
-        ad_ids = []
-        primary_copy = campaign_draft.get("primary_copy", {})
-        variations = campaign_draft.get("variations", [])
-        
-        # Create primary ad
-        if primary_copy:
-            ad_response = await self._create_single_ad(url, adset_id, primary_copy, "Primary")
-            if ad_response.get("success"):
-                ad_ids.append(ad_response["id"])
-        
-        # Create variation ads
-        for i, variation in enumerate(variations[:2]):  # Limit to 2 variations
-            ad_response = await self._create_single_ad(url, adset_id, variation, f"Variation {i+1}")
-            if ad_response.get("success"):
-                ad_ids.append(ad_response["id"])
-        
-        if ad_ids:
-            return {"success": True, "ad_ids": ad_ids}
-        else:
-            return {"success": False, "error": "No ads created successfully"}
     
-    async def _create_single_ad(self, url: str, adset_id: str, ad_copy: Dict[str, Any], name_suffix: str) -> Dict[str, Any]:
-        """Create a single ad"""
+    def _ad_payload(self, adset_id: str, ad_copy: AdCopy, name_suffix: str) -> Dict[str, Any]:
+        """Ad create fields (without the access token)"""
         creative_data = {
             "object_story_spec": {
                 "page_id": "your_page_id",  # This would be configured
                 "link_data": {
-                    "message": ad_copy.get("description", ""),
+                    "message": ad_copy.description,
                     "link": "https://example.com",  # This would be the actual landing page
-                    "name": ad_copy.get("headline", ""),
+                    "name": ad_copy.headline,
                     "call_to_action": {
-                        "type": self._map_cta(ad_copy.get("cta", "LEARN_MORE"))
+                        "type": self._map_cta(ad_copy.cta)
                     }
                 }
             }
         }
         
-        ad_data = {
+        return {
+            **_BASE_AD_FIELDS,
             "name": f"MarkezardAI Ad - {name_suffix}",
             "adset_id": adset_id,
-            "creative": json.dumps(creative_data),
-            "status": "PAUSED",
-            "access_token": self.access_token
+            "creative": creative_data
         }
+    
+    def _ad_copies(self, draft: PublishDraft) -> List[Tuple[AdCopy, str]]:
+        """Ad copies to publish with their name suffixes: the primary copy plus up to 2 variations"""
+        copies = []
+        if draft.primary_copy is not None:
+            copies.append((draft.primary_copy, "Primary"))
+        for i, variation in enumerate(draft.variations[:2]):  # Limit to 2 variations
+            copies.append((variation, f"Variation {i+1}"))
+        return copies
+    
+    async def _create_object(self, url: str, payload: Dict[str, Any]) -> Dict[str, Any]:
+        """POST one create request and report the new object's ID"""
+        body = orjson.dumps({**payload, "access_token": self.access_token})
+        status, raw = await self._request("POST", url, data=body, headers=_JSON_HEADERS)
+        result = orjson.loads(raw)
+        if status == 200 and result.get("id"):
+            return {"success": True, "id": result["id"]}
+        else:
+            return {"success": False, "error": result}
+    
+    async def _create_campaign(self, draft: PublishDraft) -> Dict[str, Any]:
+        """Create Meta Ads campaign"""
+        return await self._create_object(self._campaigns_url, self._campaign_payload(draft))
+    
+    async def _create_ad_set(self, campaign_id: str, draft: PublishDraft) -> Dict[str, Any]:
+        """Create Meta Ads ad set"""
+        return await self._create_object(self._adsets_url, self._adset_payload(campaign_id, draft))
+    
+    async def _create_ads(self, adset_id: str, draft: PublishDraft) -> Dict[str, Any]:
+        """Create Meta Ads"""
+        # Ads only depend on the ad set, so create them all concurrently
+        ad_requests = [
+            self._create_object(self._ads_url, self._ad_payload(adset_id, ad_copy, name_suffix))
+            for ad_copy, name_suffix in self._ad_copies(draft)
+        ]
         
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-            async with session.post(url, data=ad_data) as response:
-                result = await response.json()
-                if response.status == 200 and result.get("id"):
-                    return {"success": True, "id": result["id"]}
-                else:
-                    return {"success": False, "error": result}
+        ad_ids = []
+        for ad_response in await asyncio.gather(*ad_requests, return_exceptions=True):
+            if isinstance(ad_response, Exception):
+                logger.error(f"Ad creation failed: {str(ad_response)}")
+            elif ad_response.get("success"):
+                ad_ids.append(ad_response["id"])
+        
+        if ad_ids:
+            return {"success": True, "ad_ids": ad_ids}
+        else:
+            return {"success": False, "error": "No ads created successfully"}
     
     async def _test_api_connection(self) -> bool:
-        """Test Meta Ads API connection"""
+        """Test Meta Ads API connection (a success is reused for CONNECTION_CHECK_TTL seconds)"""
+        if time.monotonic() < self._conn_ok_until:
+            return True
+        
         try:
             url = f"{self.base_url}/me"
             params = {"access_token": self.access_token}
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=10)) as session:
-                async with session.get(url, params=params) as response:
-                    return response.status == 200
-                    
+            status, _ = await self._request("GET", url, params=params, timeout=aiohttp.ClientTimeout(total=10))
+            ok = status == 200
+            
+            # Only successes are cached, so a failing token is re-checked on the next dry run
+            self._conn_ok_until = time.monotonic() + CONNECTION_CHECK_TTL if ok else 0.0
+            return ok
+                
         except Exception as e:
+            self._conn_ok_until = 0.0
             logger.error(f"API connection test failed: {str(e)}")
             return False
     
@@ -321,45 +613,92 @@ class MetaAdsService:
             url = f"{self.base_url}/{campaign_id}/insights"
             params = {
                 "access_token": self.access_token,
-                "fields": "impressions,clicks,spend,conversions,ctr,cpc",
-                "date_preset": "last_7_days"
+                "fields": ANALYTICS_FIELDS,
+                "date_preset": ANALYTICS_DATE_PRESET
             }
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-                async with session.get(url, params=params) as response:
-                    if response.status == 200:
-                        result = await response.json()
-                        data = result.get("data", [])
-                        if data:
-                            logger.info(f"✅ Retrieved analytics for campaign: {campaign_id}")
-                            return self._parse_analytics_data(data[0])
-                        else:
-                            raise ValueError(f"No analytics data found for campaign: {campaign_id}")
-                    else:
-                        error_text = await response.text()
-                        raise RuntimeError(f"Meta Ads API error {response.status}: {error_text}")
+            status, raw = await self._request("GET", url, params=params)
+            
+            if status != 200:
+                raise RuntimeError(f"Meta Ads API error {status}: {raw.decode(errors='replace')}")
+            
+            data = orjson.loads(raw).get("data", [])
+            if data:
+                logger.info(f"✅ Retrieved analytics for campaign: {campaign_id}")
+                return self._parse_analytics_data(data[0])
+            else:
+                raise ValueError(f"No analytics data found for campaign: {campaign_id}")
             
         except Exception as e:
             logger.error(f"Failed to get campaign analytics: {str(e)}")
             raise RuntimeError(f"Meta Ads analytics request failed: {str(e)}")
     
-    def _validate_campaign_draft(self, campaign_draft: Dict[str, Any]) -> List[str]:
+    async def get_campaign_analytics_batch(self, campaign_ids: List[str]) -> Dict[str, Any]:
+        """
+        Get analytics for several campaigns in one Graph API batch request
+        
+        Args:
+            campaign_ids: Up to MAX_BATCH_SIZE campaign IDs
+        
+        Returns:
+            Dict mapping each campaign ID to its parsed analytics, or to the
+            exception raised while fetching it
+        """
+        query = urlencode({"fields": ANALYTICS_FIELDS, "date_preset": ANALYTICS_DATE_PRESET})
+        batch = [
+            {"method": "GET", "relative_url": f"{campaign_id}/insights?{query}"}
+            for campaign_id in campaign_ids
+        ]
+        
+        status, raw = await self._request(
+            "POST",
+            f"{self.base_url}/",
+            data={"access_token": self.access_token, "batch": orjson.dumps(batch).decode()}
+        )
+        
+        if status != 200:
+            raise RuntimeError(f"Meta Ads API error {status}: {raw.decode(errors='replace')}")
+        replies = orjson.loads(raw)
+        
+        results = {}
+        for campaign_id, reply in zip(campaign_ids, replies):
+            try:
+                if not reply or reply.get("code") != 200:
+                    code = reply.get("code") if reply else "timeout"
+                    body = reply.get("body") if reply else ""
+                    raise RuntimeError(f"Meta Ads API error {code}: {body}")
+                
+                data = orjson.loads(reply["body"]).get("data", [])
+                if not data:
+                    raise ValueError(f"No analytics data found for campaign: {campaign_id}")
+                
+                results[campaign_id] = self._parse_analytics_data(data[0])
+            except Exception as e:
+                logger.error(f"Failed to get campaign analytics: {str(e)}")
+                results[campaign_id] = RuntimeError(f"Meta Ads analytics request failed: {str(e)}")
+        
+        logger.info(f"✅ Retrieved batched analytics for {len(campaign_ids)} campaigns")
+        return results
+    
+    def _validate_campaign_draft(self, draft: PublishDraft) -> List[str]:
         """Validate campaign draft structure"""
         errors = []
         
-        if not campaign_draft.get("primary_copy"):
+        if draft.primary_copy is None:
             errors.append("Missing primary ad copy")
         
-        primary_copy = campaign_draft.get("primary_copy", {})
-        if not primary_copy.get("headline"):
+        primary_copy = draft.primary_copy or AdCopy()
+        if not primary_copy.headline:
             errors.append("Missing headline in primary copy")
-        if not primary_copy.get("description"):
+        if not primary_copy.description:
             errors.append("Missing description in primary copy")
         
-        budget = campaign_draft.get("budget", {})
-        if not budget.get("daily_budget") or budget.get("daily_budget", 0) <= 0:
+        if not draft.daily_budget or draft.daily_budget <= 0:
             errors.append("Invalid or missing daily budget")
         
+        if not draft.name:
+            errors.append("Campaign name is required")
+        
         return errors
     
     def _validate_confirm_token(self, token: str) -> bool:
@@ -368,7 +707,7 @@ class MetaAdsService:
         # For now, accept any non-empty token
         return bool(token and len(token) > 10)
     
-    def _build_targeting(self, campaign_draft: Dict[str, Any]) -> Dict[str, Any]:
+    def _build_targeting(self, draft: PublishDraft) -> Dict[str, Any]:
         """Build Meta Ads targeting from campaign draft"""
         targeting = {
             "geo_locations": {"countries": ["US"]},
@@ -377,79 +716,185 @@ class MetaAdsService:
         }
         
         # Add interest targeting from untapped interests
-        interests = campaign_draft.get("untapped_interests", [])
-        if interests:
+        if draft.interests:
             targeting["interests"] = [
-                {"id": str(hash(interest["interest"])), "name": interest["interest"]}
-                for interest in interests[:10]  # Limit to 10 interests
+                {"id": _stable_id(interest), "name": interest}
+                for interest in islice(draft.interests, 10)  # Limit to 10 interests
             ]
         
         return targeting
     
     def _map_objective(self, goal: str) -> str:
         """Map campaign goal to Meta Ads objective"""
-        mapping = {
-            "awareness": "BRAND_AWARENESS",
-            "traffic": "LINK_CLICKS",
-            "conversions": "CONVERSIONS",
-            "leads": "LEAD_GENERATION"
-        }
-        return mapping.get(goal, "CONVERSIONS")
+        return _OBJECTIVE_MAP.get(goal, "CONVERSIONS")
     
     def _map_cta(self, cta: str) -> str:
         """Map CTA text to Meta Ads CTA type"""
         cta_lower = cta.lower()
-        if "shop" in cta_lower or "buy" in cta_lower:
-            return "SHOP_NOW"
-        elif "learn" in cta_lower:
-            return "LEARN_MORE"
-        elif "sign" in cta_lower:
-            return "SIGN_UP"
-        else:
-            return "LEARN_MORE"
+        for keyword, cta_type in _CTA_KEYWORDS:
+            if keyword in cta_lower:
+                return cta_type
+        return "LEARN_MORE"
     
-    def _estimate_reach(self, campaign_draft: Dict[str, Any]) -> int:
+    def _estimate_reach(self, draft: PublishDraft) -> int:
         """Estimate daily reach for campaign"""
-        budget = campaign_draft.get("budget", {}).get("daily_budget", 10)
-        # Simple estimation: $1 = ~100 reach
-        return int(budget * 100)
+        return _reach(draft.daily_budget or 10)
     
-    def _estimate_audience_size(self, campaign_draft: Dict[str, Any]) -> int:
+    def _estimate_audience_size(self, draft: PublishDraft) -> int:
         """Estimate targeting audience size"""
-        interests = campaign_draft.get("untapped_interests", [])
-        base_size = 1000000  # 1M base
-        
-        # Reduce size based on number of interests (more specific = smaller audience)
-        if interests:
-            reduction_factor = max(0.1, 1 - (len(interests) * 0.1))
-            base_size = int(base_size * reduction_factor)
-        
-        return base_size
+        return _audience_size(len(draft.interests))
     
     def _generate_campaign_id(self) -> str:
         """Generate a unique campaign ID"""
-        timestamp = str(int(datetime.utcnow().timestamp()))
-        hash_input = f"markezard_{timestamp}"
-        return hashlib.md5(hash_input.encode()).hexdigest()[:12]
+        # Nanosecond clock plus PID keeps IDs distinct within a second and across workers
+        hash_input = f"markezard_{time.time_ns()}_{os.getpid()}"
+        return hashlib.blake2b(hash_input.encode(), digest_size=6).hexdigest()
     
     
     def _parse_analytics_data(self, data: Dict[str, Any]) -> Dict[str, Any]:
         """Parse analytics data from Meta Ads API"""
+        conversions = float(data.get("conversions", 0))
+        spend = float(data.get("spend", 0))
         return {
+            **_ANALYTICS_STATIC,
             "campaign_id": data.get("campaign_id", ""),
-            "platform": "meta",
             "metrics": {
                 "impressions": int(data.get("impressions", 0)),
                 "clicks": int(data.get("clicks", 0)),
-                "conversions": int(data.get("conversions", 0)),
-                "spend": float(data.get("spend", 0)),
+                "conversions": int(conversions),
+                "spend": spend,
                 "ctr": float(data.get("ctr", 0)),
                 "cpc": float(data.get("cpc", 0)),
-                "roas": float(data.get("conversions", 0)) * 50 / max(float(data.get("spend", 1)), 1)  # Estimated ROAS
+                "roas": conversions * 50 / (spend if spend > 1 else 1)  # Estimated ROAS
             },
-            "last_updated": datetime.utcnow().isoformat(),
-            "data_source": "live"
+            "last_updated": _iso_now()
         }
 
-# Global instance
-meta_ads_service = MetaAdsService()
+class AnalyticsBatcher:
+    """
+    Coalesces concurrent analytics lookups into Graph API batch requests
+    
+    Lookups queued together are sent as one batch, waiting up to max_wait
+    for more when several arrive at once (or until max_batch are pending);
+    each caller gets its own result back. Batches run concurrently.
+    """
+    
+    def __init__(self, service: MetaAdsService, max_batch: int = MAX_BATCH_SIZE, max_wait: float = 0.01):
+        self.service = service
+        self.max_batch = max_batch
+        self.max_wait = max_wait
+        self._queue: Optional[asyncio.Queue] = None
+        self._worker: Optional[asyncio.Task] = None
+        self._dispatches = set()
+    
+    async def get(self, campaign_id: str) -> Dict[str, Any]:
+        """Get analytics for one campaign through the shared batch"""
+        if self._worker is None or self._worker.done():
+            self._queue = asyncio.Queue()
+            self._worker = asyncio.create_task(self._run())
+        
+        future = asyncio.get_running_loop().create_future()
+        await self._queue.put((campaign_id, future))
+        return await future
+    
+    async def _run(self):
+        """Collect pending lookups and dispatch them in batches"""
+        loop = asyncio.get_running_loop()
+        while True:
+            pending = [await self._queue.get()]
+            
+            # Let callers scheduled in the same loop iteration enqueue, then take what is already waiting
+            await asyncio.sleep(0)
+            while len(pending) < self.max_batch and not self._queue.empty():
+                pending.append(self._queue.get_nowait())
+            
+            # A lookup arriving on its own goes out immediately; only a burst waits for stragglers
+            if len(pending) > 1:
+                deadline = loop.time() + self.max_wait
+                while len(pending) < self.max_batch:
+                    timeout = deadline - loop.time()
+                    if timeout <= 0:
+                        break
+                    try:
+                        pending.append(await asyncio.wait_for(self._queue.get(), timeout))
+                    except asyncio.TimeoutError:
+                        break
+            
+            # Dispatch without waiting so a slow batch doesn't hold up the next one
+            task = asyncio.create_task(self._dispatch(pending))
+            self._dispatches.add(task)
+            task.add_done_callback(self._dispatches.discard)
+    
+    async def _dispatch(self, pending: List[tuple]):
+        """Issue one request (a Graph batch for several campaigns) and resolve every waiting caller"""
+        campaign_ids = list(dict.fromkeys(campaign_id for campaign_id, _ in pending))
+        try:
+            if len(campaign_ids) == 1:
+                # A lone lookup is a plain insights GET, no batch envelope needed
+                try:
+                    results = {campaign_ids[0]: await self.service.get_campaign_analytics(campaign_ids[0])}
+                except Exception as e:
+                    results = {campaign_ids[0]: e}
+            else:
+                results = await self._fetch_batch(campaign_ids)
+        except asyncio.CancelledError:
+            # Cancelled by close(); don't leave callers waiting forever
+            for _, future in pending:
+                if not future.done():
+                    future.set_exception(RuntimeError("Meta Ads analytics batcher is shut down"))
+            raise
+        
+        for campaign_id, future in pending:
+            if future.done():
+                continue
+            result = results.get(campaign_id)
+            if isinstance(result, Exception):
+                future.set_exception(result)
+            elif result is None:
+                future.set_exception(RuntimeError(f"No analytics returned for campaign: {campaign_id}"))
+            else:
+                future.set_result(result)
+    
+    async def close(self):
+        """Stop the worker and in-flight dispatches, failing every lookup still waiting"""
+        tasks = [*self._dispatches]
+        if self._worker is not None:
+            tasks.append(self._worker)
+        for task in tasks:
+            task.cancel()
+        await asyncio.gather(*tasks, return_exceptions=True)
+        self._worker = None
+        
+        # Lookups dispatched but cancelled mid-request fail in _dispatch; these never left the queue
+        while self._queue is not None and not self._queue.empty():
+            _, future = self._queue.get_nowait()
+            if not future.done():
+                future.set_exception(RuntimeError("Meta Ads analytics batcher is shut down"))
+    
+    async def _fetch_batch(self, campaign_ids: List[str]) -> Dict[str, Any]:
+        """Analytics for several campaigns, with a failed request reported against each of them"""
+        try:
+            return await self.service.get_campaign_analytics_batch(campaign_ids)
+        except Exception as e:
+            logger.error(f"Batched analytics request failed: {str(e)}")
+            error = RuntimeError(f"Meta Ads analytics request failed: {str(e)}")
+            return {campaign_id: error for campaign_id in campaign_ids}
+
+# Lazily created instances, so importing this module needs no Meta credentials
+@functools.lru_cache(maxsize=1)
+def get_meta_ads_service() -> MetaAdsService:
+    """Get the shared Meta Ads service, creating it on first use"""
+    return MetaAdsService()
+
+@functools.lru_cache(maxsize=1)
+def get_analytics_batcher() -> AnalyticsBatcher:
+    """Get the shared analytics batcher, creating it on first use"""
+    return AnalyticsBatcher(get_meta_ads_service())
+
+async def close_meta_ads_service():
+    """Stop the analytics batcher and close the shared service's HTTP session, if they were ever created"""
+    # The batcher goes first so no queued lookup runs against a closed session
+    if get_analytics_batcher.cache_info().currsize:
+        await get_analytics_batcher().close()
+    if get_meta_ads_service.cache_info().currsize:
+        await get_meta_ads_service().close()
@@ -4,27 +4,278 @@ Supports Shopify, WordPress, and custom sites
 """
 
 import os
-import json
+import codecs
+import functools
 import logging
-from typing import Dict, Any, List, Optional
+from typing import Dict, Any, List, Optional, Tuple
 from urllib.parse import urljoin, urlparse
 import re
+from hashlib import blake2b
+from html import escape
+from itertools import islice
+from types import MappingProxyType
 
 import requests
 import aiohttp
 import asyncio
-from bs4 import BeautifulSoup
-import bleach
+import orjson
+from cachetools import TTLCache
+from selectolax.lexbor import LexborHTMLParser, LexborNode
+import lxml.html
+from lxml import etree
 
 from ..models.responses import Product, SiteMeta, WebsiteIntegrationResponse
 
 logger = logging.getLogger(__name__)
 
+# Patterns used on every scraped product, compiled once
+_WS_RE = re.compile(r'\s+')
+_DIGITS_RE = re.compile(r'[\d.]+')
+_NON_NUMERIC_RE = re.compile(r'[^\d.]')
+
+# Integration results are reused for repeat integrations of the same store
+INTEGRATION_CACHE_SIZE = 1024
+INTEGRATION_CACHE_TTL = 300
+
+# Per-image budget for the optional sample image HEAD checks
+IMAGE_CHECK_TIMEOUT = 5
+
+# Sent with every request; br needs the brotli package, which aiohttp picks up
+_DEFAULT_HEADERS = MappingProxyType({
+    'Accept-Encoding': 'br, gzip, deflate',
+    'Accept': 'text/html,application/json;q=0.9,*/*;q=0.8',
+    'User-Agent': 'MarkezardAI-Bot/1.0'
+})
+
+# Retries for JSON endpoints on 5xx and connection errors, with the delay
+# doubling from FETCH_RETRY_BACKOFF seconds
+FETCH_RETRIES = 2
+FETCH_RETRY_BACKOFF = 0.5
+
+# Images kept per product
+MAX_PRODUCT_IMAGES = 3
+
+# Chunk size for streamed page reads
+STREAM_CHUNK_SIZE = 65536
+
+# Leading bytes searched for a BOM or <meta> charset when Content-Type has none
+SNIFF_SIZE = 2048
+_BOMS = (
+    (codecs.BOM_UTF8, 'utf-8'),
+    (codecs.BOM_UTF16_LE, 'utf-16-le'),
+    (codecs.BOM_UTF16_BE, 'utf-16-be')
+)
+# Matches both <meta charset="..."> and the http-equiv Content-Type form
+_META_CHARSET_RE = re.compile(rb'<meta[^>]*?charset\s*=\s*["\']?\s*([\w.:-]+)', re.IGNORECASE)
+
+# (attribute, value) of the <meta> tags the site metadata is read from -> field
+_META_FIELDS = {
+    ('name', 'description'): 'description',
+    ('property', 'og:description'): 'og_description',
+    ('property', 'og:image'): 'og_image',
+    ('name', 'theme-color'): 'theme_color'
+}
+
+# Pattern-scrape selectors, most preferred first. Each list is also queried as
+# one combined selector so a page or card is traversed once, then the first
+# selector with a match wins as if they had been tried in turn; keep them to
+# a bare tag, .class or [attr] so _selector_rank can tell which one matched.
+_PRODUCT_SELECTORS = (
+    '.product', '.product-item', '.product-card',
+    '[data-product]', '.woocommerce-product',
+    '.shop-item', '.catalog-item'
+)
+_NAME_SELECTORS = ('h1', 'h2', 'h3', '.title', '.name', '.product-title')
+_DESC_SELECTORS = ('.description', '.summary', '.excerpt', 'p')
+_PRICE_SELECTORS = ('.price', '.cost', '.amount', '[data-price]')
+
+# Structured data lookups, compiled once and run by libxml2
+_JSON_LD_SCRIPTS = etree.XPath('//script[@type = "application/ld+json"]')
+_MICRODATA_ITEMS = etree.XPath('//*[contains(@itemtype, "Product")]')
+_ITEMPROP = etree.XPath('(.//*[@itemprop = $prop])[1]')
+_ITEMPROP_IMAGES = etree.XPath('.//img[@itemprop = "image"]/@src')
+
+
+# Elements whose text is separated from its neighbours when markup is flattened
+_BLOCK_TAGS = ('p', 'br', 'div', 'li', 'ul', 'ol', 'tr', 'td', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6')
+
+def _stable_id(value: str) -> str:
+    """Deterministic short ID for a string, identical across processes (unlike hash())"""
+    return blake2b(value.encode(), digest_size=8).hexdigest()
+
+def _selector_rank(selectors: Tuple[str, ...], tag: str, classes: List[str], attrs: Dict[str, Any]) -> int:
+    """Index of the first simple selector (tag, .class or [attr]) an element matches"""
+    for rank, selector in enumerate(selectors):
+        if selector[0] == '.':
+            if selector[1:] in classes:
+                return rank
+        elif selector[0] == '[':
+            if selector[1:-1] in attrs:
+                return rank
+        elif selector == tag:
+            return rank
+    return len(selectors)
+
+def _by_priority(nodes: List[Any], ranks: List[int]) -> List[Any]:
+    """
+    The first node (in document order) for each matched selector, in selector order
+    
+    This is what calling select_one() for each selector in turn would return.
+    """
+    firsts = {}
+    for node, rank in zip(nodes, ranks):
+        firsts.setdefault(rank, node)
+    return [firsts[rank] for rank in sorted(firsts)]
+
+def _lexbor_select(root: Any, selectors: Tuple[str, ...]) -> List[LexborNode]:
+    """Query a selector list as one combined selector, each element once, in document order"""
+    # Lexbor returns an element once per selector in the list that it matches
+    seen = set()
+    nodes = []
+    for node in root.css(', '.join(selectors)):
+        if node.mem_id not in seen:
+            seen.add(node.mem_id)
+            nodes.append(node)
+    return nodes
+
+def _lexbor_rank(selectors: Tuple[str, ...], node: LexborNode) -> int:
+    attrs = node.attributes
+    return _selector_rank(selectors, node.tag, (attrs.get('class') or '').split(), attrs)
+
+def _known_charset(charset: Optional[str]) -> Optional[str]:
+    """The charset if Python can decode it, else None"""
+    if charset:
+        try:
+            codecs.lookup(charset)
+            return charset
+        except LookupError:
+            pass
+    return None
+
+def _page_charset(prefix: bytes, declared: Optional[str]) -> str:
+    """
+    Charset to decode a page with
+    
+    The Content-Type charset wins, then a BOM, then a <meta> charset in the
+    first SNIFF_SIZE bytes; pages declaring nothing are taken as UTF-8
+    (libxml2 would otherwise assume ISO-8859-1).
+    """
+    charset = _known_charset(declared)
+    if charset:
+        return charset
+    for bom, bom_charset in _BOMS:
+        if prefix.startswith(bom):
+            return bom_charset
+    match = _META_CHARSET_RE.search(prefix, 0, SNIFF_SIZE)
+    if match:
+        charset = _known_charset(match.group(1).decode('ascii'))
+        if charset:
+            return charset
+    return 'utf-8'
+
+@functools.lru_cache(maxsize=32)
+def _html_parser(charset: str) -> lxml.html.HTMLParser:
+    """lxml HTML parser that decodes with the given charset"""
+    return lxml.html.HTMLParser(encoding=charset)
+
+def _lxml_document(raw: bytes, charset: str) -> lxml.html.HtmlElement:
+    """Parse a fetched page from its bytes with lxml, decoding with charset"""
+    try:
+        parser = _html_parser(charset)
+    except LookupError:
+        # Known to Python but not to libxml2
+        parser = _html_parser('utf-8')
+    return lxml.html.document_fromstring(raw, parser=parser)
+
+def _page_text(root: lxml.html.HtmlElement, raw: bytes) -> str:
+    """Decode a page with the encoding lxml parsed it with"""
+    encoding = root.getroottree().docinfo.encoding or 'utf-8'
+    try:
+        return raw.decode(encoding, errors='replace')
+    except LookupError:
+        return raw.decode('utf-8', errors='replace')
+
+class _HeadMetaTarget:
+    """
+    lxml parser target collecting the site metadata tags from a page's <head>
+    
+    done is set once the head is finished, so the caller can stop feeding
+    and never download or parse the rest of the page.
+    """
+    
+    def __init__(self):
+        self.found: Dict[str, Dict[str, str]] = {}
+        self.title: Optional[str] = None
+        self.done = False
+        self._title_parts: Optional[List[str]] = None
+    
+    def start(self, tag: str, attrib: Dict[str, str]):
+        # Events past the head can still arrive from the rest of the last chunk fed
+        if self.done:
+            return
+        # The first tag of each kind wins
+        if tag == 'meta':
+            for attr in ('name', 'property'):
+                field = _META_FIELDS.get((attr, attrib.get(attr)))
+                if field and field not in self.found:
+                    self.found[field] = dict(attrib)
+        elif tag == 'title':
+            if self.title is None:
+                self._title_parts = []
+        elif tag == 'link':
+            if 'icon' in (attrib.get('rel') or '').split() and 'icon' not in self.found:
+                self.found['icon'] = dict(attrib)
+        elif tag == 'body':
+            self.done = True
+    
+    def end(self, tag: str):
+        if tag == 'title' and self._title_parts is not None:
+            self.title = ''.join(self._title_parts)
+            self._title_parts = None
+        elif tag == 'head':
+            self.done = True
+    
+    def data(self, text: str):
+        if self._title_parts is not None:
+            self._title_parts.append(text)
+    
+    def close(self) -> Dict[str, Dict[str, str]]:
+        return self.found
+
 class WebsiteService:
     def __init__(self):
         self.session_timeout = 30
         self.max_products = 50
-        self.allowed_tags = ['p', 'br', 'strong', 'em', 'ul', 'ol', 'li', 'h1', 'h2', 'h3', 'h4', 'h5', 'h6']
+        self._session: Optional[aiohttp.ClientSession] = None
+        self._cache: TTLCache = TTLCache(maxsize=INTEGRATION_CACHE_SIZE, ttl=INTEGRATION_CACHE_TTL)
+        self._integrations: Dict[Tuple[str, str, str], asyncio.Task] = {}
+        # Drop sample images that don't resolve, at the cost of one concurrent round of HEADs
+        self.validate_images = os.getenv('WEBSITE_VALIDATE_IMAGES', 'false').lower() in ('1', 'true', 'yes')
+    
+    async def _get_session(self) -> aiohttp.ClientSession:
+        """Get the shared keep-alive HTTP session, creating it on first use"""
+        if self._session is None or self._session.closed:
+            self._session = aiohttp.ClientSession(
+                timeout=aiohttp.ClientTimeout(total=self.session_timeout),
+                headers=_DEFAULT_HEADERS,
+                # Most requests hit the one store being integrated, so allow a deep
+                # per-host pool and keep resolved addresses and idle sockets around
+                connector=aiohttp.TCPConnector(
+                    limit=200,
+                    limit_per_host=32,
+                    use_dns_cache=True,
+                    ttl_dns_cache=600,
+                    keepalive_timeout=75,
+                    enable_cleanup_closed=True
+                )
+            )
+        return self._session
+    
+    async def close(self):
+        """Close the shared HTTP session"""
+        if self._session is not None and not self._session.closed:
+            await self._session.close()
+        self._session = None
     
     async def integrate_website(
         self,
@@ -43,13 +294,46 @@ class WebsiteService:
         Returns:
             WebsiteIntegrationResponse with products and site metadata
         """
+        # Credentials are part of the key (as a digest) so API results are never
+        # served to a caller with different credentials
+        credentials = _stable_id(orjson.dumps(oauth, option=orjson.OPT_SORT_KEYS).decode()) if oauth else ''
+        key = (platform, url, credentials)
+        
+        result = self._cache.get(key)
+        if result is not None:
+            return result
+        
+        # Concurrent misses for the same site share one integration
+        integration = self._integrations.get(key)
+        if integration is None:
+            integration = asyncio.create_task(self._integrate(platform, url, oauth))
+            self._integrations[key] = integration
+            integration.add_done_callback(lambda _: self._integrations.pop(key, None))
+        
+        result = await asyncio.shield(integration)
+        # Failed integrations come back empty; don't hold on to those
+        if result.products:
+            self._cache[key] = result
+        return result
+    
+    async def _integrate(
+        self,
+        platform: str,
+        url: str,
+        oauth: Optional[Dict[str, Any]]
+    ) -> WebsiteIntegrationResponse:
+        """Run one integration for integrate_website, uncached"""
         try:
             if platform == "shopify":
-                return await self._integrate_shopify(url, oauth)
+                result = await self._integrate_shopify(url, oauth)
             elif platform == "wordpress":
-                return await self._integrate_wordpress(url, oauth)
+                result = await self._integrate_wordpress(url, oauth)
             else:
-                return await self._integrate_custom(url)
+                result = await self._integrate_custom(url)
+            
+            if self.validate_images and result.sample_images:
+                result.sample_images = await self._validate_images(result.sample_images, await self._get_session())
+            return result
                 
         except Exception as e:
             logger.error(f"Website integration failed for {url}: {str(e)}")
@@ -78,29 +362,29 @@ class WebsiteService:
         """Use Shopify Admin API"""
         shop_domain = self._extract_shopify_domain(url)
         api_url = f"https://{shop_domain}/admin/api/2023-10/products.json"
+        shop_url = f"https://{shop_domain}/admin/api/2023-10/shop.json"
         
         headers = {
             'X-Shopify-Access-Token': access_token,
             'Content-Type': 'application/json'
         }
         
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-            async with session.get(api_url, headers=headers) as response:
-                if response.status == 200:
-                    data = await response.json()
-                    products = self._parse_shopify_products(data.get('products', []))
-                    
-                    # Get shop info
-                    shop_url = f"https://{shop_domain}/admin/api/2023-10/shop.json"
-                    async with session.get(shop_url, headers=headers) as shop_response:
-                        shop_data = await shop_response.json() if shop_response.status == 200 else {}
-                        site_meta = self._parse_shopify_shop_meta(shop_data.get('shop', {}))
-                    
-                    return WebsiteIntegrationResponse(
-                        products=products[:self.max_products],
-                        site_meta=site_meta,
-                        sample_images=self._extract_sample_images(products)
-                    )
+        # Products and shop info are independent, so fetch them concurrently
+        (status, data), (shop_status, shop_data) = await asyncio.gather(
+            # Ask for only the products we keep (Shopify allows up to 250 per page)
+            self._fetch_json(api_url, headers=headers, params={'limit': self.max_products}),
+            self._fetch_json(shop_url, headers=headers)
+        )
+        
+        if status == 200:
+            products = self._parse_shopify_products(data.get('products', []))
+            site_meta = self._parse_shopify_shop_meta(shop_data.get('shop', {}) if shop_status == 200 else {})
+            
+            return WebsiteIntegrationResponse(
+                products=products[:self.max_products],
+                site_meta=site_meta,
+                sample_images=self._extract_sample_images(products)
+            )
         
         # Fallback to public integration
         return await self._shopify_public_integration(url)
@@ -111,20 +395,18 @@ class WebsiteService:
             shop_domain = self._extract_shopify_domain(url)
             products_url = f"https://{shop_domain}/products.json"
             
-            async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-                async with session.get(products_url) as response:
-                    if response.status == 200:
-                        data = await response.json()
-                        products = self._parse_shopify_products(data.get('products', []))
-                        
-                        # Get site metadata by scraping
-                        site_meta = await self._scrape_site_meta(url, session)
-                        
-                        return WebsiteIntegrationResponse(
-                            products=products[:self.max_products],
-                            site_meta=site_meta,
-                            sample_images=self._extract_sample_images(products)
-                        )
+            status, data = await self._fetch_json(products_url, params={'limit': self.max_products})
+            if status == 200:
+                products = self._parse_shopify_products(data.get('products', []))
+                
+                # Get site metadata by scraping
+                site_meta = await self._scrape_site_meta(url, await self._get_session())
+                
+                return WebsiteIntegrationResponse(
+                    products=products[:self.max_products],
+                    site_meta=site_meta,
+                    sample_images=self._extract_sample_images(products)
+                )
         except Exception as e:
             logger.error(f"Shopify public integration failed: {str(e)}")
         
@@ -151,116 +433,234 @@ class WebsiteService:
         
         auth = aiohttp.BasicAuth(oauth['consumer_key'], oauth['consumer_secret'])
         
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-            async with session.get(api_url, auth=auth, params={'per_page': self.max_products}) as response:
-                if response.status == 200:
-                    products_data = await response.json()
-                    products = self._parse_woocommerce_products(products_data)
-                    
-                    site_meta = await self._scrape_site_meta(url, session)
-                    
-                    return WebsiteIntegrationResponse(
-                        products=products,
-                        site_meta=site_meta,
-                        sample_images=self._extract_sample_images(products)
-                    )
-        
-        return await self._integrate_custom(url)
-    
-    async def _integrate_custom(self, url: str) -> WebsiteIntegrationResponse:
-        """Scrape custom website for products and metadata"""
-        async with aiohttp.ClientSession(timeout=aiohttp.ClientTimeout(total=self.session_timeout)) as session:
-            # Get site metadata
-            site_meta = await self._scrape_site_meta(url, session)
+        status, products_data = await self._fetch_json(api_url, auth=auth, params={'per_page': self.max_products})
+        if status == 200:
+            products = self._parse_woocommerce_products(products_data)
             
-            # Try to find products
-            products = await self._scrape_products(url, session)
+            site_meta = await self._scrape_site_meta(url, await self._get_session())
             
             return WebsiteIntegrationResponse(
-                products=products[:self.max_products],
+                products=products,
                 site_meta=site_meta,
                 sample_images=self._extract_sample_images(products)
             )
+        
+        return await self._integrate_custom(url)
+    
+    async def _integrate_custom(self, url: str) -> WebsiteIntegrationResponse:
+        """Scrape custom website for products and metadata"""
+        # One fetch and one parse serve both the metadata and the products
+        try:
+            page = await self._fetch_and_parse(url, await self._get_session())
+        except Exception as e:
+            logger.error(f"Failed to fetch {url}: {str(e)}")
+            page = None
+        
+        if page is not None:
+            root, raw = page
+            site_meta = self._extract_site_meta_from_tree(root, url)
+            products = self._extract_products_from_tree(root, raw, url)
+        else:
+            site_meta = SiteMeta(title="Unknown Site", description="")
+            products = []
+        
+        return WebsiteIntegrationResponse(
+            products=products[:self.max_products],
+            site_meta=site_meta,
+            sample_images=self._extract_sample_images(products)
+        )
+    
+    async def _validate_images(self, urls: List[Any], session: aiohttp.ClientSession) -> List[Any]:
+        """Keep the image URLs that resolve, checking them all concurrently with HEAD"""
+        timeout = aiohttp.ClientTimeout(total=IMAGE_CHECK_TIMEOUT)
+        
+        async def check(image_url) -> bool:
+            async with session.head(str(image_url), allow_redirects=True, timeout=timeout) as response:
+                # 405: the server doesn't do HEAD, which says nothing about the image
+                return response.status < 400 or response.status == 405
+        
+        results = await asyncio.gather(*(check(image_url) for image_url in urls), return_exceptions=True)
+        return [image_url for image_url, ok in zip(urls, results) if ok is True]
+    
+    async def _fetch_json(
+        self,
+        url: str,
+        *,
+        headers: Optional[Dict[str, str]] = None,
+        auth: Optional[aiohttp.BasicAuth] = None,
+        params: Optional[Dict[str, Any]] = None,
+        retries: int = FETCH_RETRIES
+    ) -> Tuple[int, Any]:
+        """
+        GET a JSON endpoint on the shared session
+        
+        5xx responses and connection errors are retried with exponential backoff;
+        the last connection error is raised once retries run out.
+        
+        Returns:
+            The status and the decoded body (None unless 200)
+        """
+        session = await self._get_session()
+        for attempt in range(retries + 1):
+            if attempt:
+                await asyncio.sleep(FETCH_RETRY_BACKOFF * 2 ** (attempt - 1))
+            try:
+                async with session.get(url, headers=headers, auth=auth, params=params) as response:
+                    if response.status >= 500 and attempt < retries:
+                        logger.warning(f"GET {url} returned {response.status}, retrying")
+                        continue
+                    if response.status != 200:
+                        return response.status, None
+                    body = await response.read()
+            except aiohttp.ClientError as e:
+                if attempt == retries:
+                    raise
+                logger.warning(f"GET {url} failed, retrying: {str(e)}")
+                continue
+            # Decoded outside the retry loop: a malformed body won't get better
+            return 200, orjson.loads(body)
     
     async def _scrape_site_meta(self, url: str, session: aiohttp.ClientSession) -> SiteMeta:
         """Scrape basic site metadata"""
         try:
             async with session.get(url) as response:
                 if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Extract title
-                    title_tag = soup.find('title')
-                    title = title_tag.get_text().strip() if title_tag else "Unknown Site"
+                    # Stream the page into a SAX-style parser and stop once <head> is done;
+                    # the parser is created once enough is buffered to pick the charset
+                    target = _HeadMetaTarget()
+                    parser = None
+                    buffered = b''
+                    async for chunk in response.content.iter_chunked(STREAM_CHUNK_SIZE):
+                        if parser is None:
+                            buffered += chunk
+                            if len(buffered) < SNIFF_SIZE:
+                                continue
+                            parser = self._head_parser(target, buffered, response.charset)
+                            chunk, buffered = buffered, b''
+                        parser.feed(chunk)
+                        if target.done:
+                            break
+                    if parser is None:
+                        # Short page: everything arrived before SNIFF_SIZE bytes
+                        parser = self._head_parser(target, buffered, response.charset)
+                        parser.feed(buffered)
+                    found = parser.close()
                     
-                    # Extract description
-                    desc_tag = soup.find('meta', attrs={'name': 'description'}) or \
-                              soup.find('meta', attrs={'property': 'og:description'})
-                    description = desc_tag.get('content', '').strip() if desc_tag else ""
-                    
-                    # Extract logo
-                    logo_tag = soup.find('meta', attrs={'property': 'og:image'}) or \
-                              soup.find('link', attrs={'rel': 'icon'})
-                    logo = None
-                    if logo_tag:
-                        logo_url = logo_tag.get('content') or logo_tag.get('href')
-                        if logo_url:
-                            logo = urljoin(url, logo_url)
-                    
-                    # Extract theme colors
-                    theme_colors = []
-                    theme_color_tag = soup.find('meta', attrs={'name': 'theme-color'})
-                    if theme_color_tag:
-                        theme_colors.append(theme_color_tag.get('content', ''))
-                    
-                    return SiteMeta(
-                        title=self._sanitize_text(title),
-                        description=self._sanitize_text(description),
-                        logo=logo,
-                        theme_colors=theme_colors
-                    )
+                    return self._build_site_meta(found, target.title, url)
         except Exception as e:
             logger.error(f"Failed to scrape site meta for {url}: {str(e)}")
         
         return SiteMeta(title="Unknown Site", description="")
     
-    async def _scrape_products(self, url: str, session: aiohttp.ClientSession) -> List[Product]:
-        """Scrape products from custom website"""
+    def _head_parser(self, target: _HeadMetaTarget, prefix: bytes, declared: Optional[str]) -> etree.HTMLParser:
+        """Streaming parser feeding target, decoding with the charset picked from prefix"""
+        try:
+            return etree.HTMLParser(target=target, encoding=_page_charset(prefix, declared))
+        except LookupError:
+            # Known to Python but not to libxml2
+            return etree.HTMLParser(target=target, encoding='utf-8')
+    
+    def _extract_site_meta_from_tree(self, root: lxml.html.HtmlElement, url: str) -> SiteMeta:
+        """Site metadata from an already parsed page, read the way _HeadMetaTarget reads it"""
+        try:
+            head = root.find('head')
+            if head is None:
+                head = root
+            
+            # The first tag of each kind wins
+            found: Dict[str, Dict[str, str]] = {}
+            title = None
+            for tag in head.iter('meta', 'link', 'title'):
+                if tag.tag == 'meta':
+                    for attr in ('name', 'property'):
+                        field = _META_FIELDS.get((attr, tag.get(attr)))
+                        if field and field not in found:
+                            found[field] = dict(tag.attrib)
+                elif tag.tag == 'link':
+                    if 'icon' in (tag.get('rel') or '').split() and 'icon' not in found:
+                        found['icon'] = dict(tag.attrib)
+                elif title is None:
+                    title = tag.text_content()
+            
+            return self._build_site_meta(found, title, url)
+        except Exception as e:
+            logger.error(f"Failed to extract site meta for {url}: {str(e)}")
+        
+        return SiteMeta(title="Unknown Site", description="")
+    
+    def _build_site_meta(self, found: Dict[str, Dict[str, str]], title: Optional[str], url: str) -> SiteMeta:
+        """SiteMeta from the collected head tags (field -> attributes) and the raw title"""
+        # Extract title
+        title = title.strip() if title is not None else "Unknown Site"
+        
+        # Extract description
+        desc_tag = found.get('description') or found.get('og_description')
+        description = desc_tag.get('content', '').strip() if desc_tag else ""
+        
+        # Extract logo
+        logo_tag = found.get('og_image') or found.get('icon')
+        logo = None
+        if logo_tag:
+            logo_url = logo_tag.get('content') or logo_tag.get('href')
+            if logo_url:
+                logo = urljoin(url, logo_url)
+        
+        # Extract theme colors
+        theme_colors = []
+        theme_color_tag = found.get('theme_color')
+        if theme_color_tag:
+            theme_colors.append(theme_color_tag.get('content', ''))
+        
+        return SiteMeta(
+            title=self._sanitize_text(title),
+            description=self._sanitize_text(description),
+            logo=logo,
+            theme_colors=theme_colors
+        )
+    
+    async def _fetch_and_parse(self, url: str, session: aiohttp.ClientSession) -> Optional[Tuple[lxml.html.HtmlElement, bytes]]:
+        """Fetch a page once and parse it, returning the lxml tree and the raw body (None unless 200)"""
+        async with session.get(url) as response:
+            if response.status != 200:
+                return None
+            # The parser decodes the bytes itself, skipping aiohttp's chardet sniffing
+            raw = await response.read()
+            charset = _page_charset(raw[:SNIFF_SIZE], response.charset)
+        
+        return _lxml_document(raw, charset), raw
+    
+    def _extract_products_from_tree(self, root: lxml.html.HtmlElement, raw: bytes, url: str) -> List[Product]:
+        """Products from an already parsed page; the HTML is re-parsed only for the pattern fallback"""
         products = []
         
         try:
-            async with session.get(url) as response:
-                if response.status == 200:
-                    html = await response.text()
-                    soup = BeautifulSoup(html, 'html.parser')
-                    
-                    # Look for JSON-LD structured data
-                    json_ld_products = self._extract_json_ld_products(soup)
-                    if json_ld_products:
-                        products.extend(json_ld_products)
-                    
-                    # Look for microdata
-                    microdata_products = self._extract_microdata_products(soup)
-                    if microdata_products:
-                        products.extend(microdata_products)
-                    
-                    # Fallback: look for common product patterns
-                    if not products:
-                        products = self._extract_pattern_products(soup, url)
-                        
+            # Look for JSON-LD structured data
+            json_ld_products = self._extract_json_ld_products(root)
+            if json_ld_products:
+                products.extend(json_ld_products)
+            
+            # Look for microdata
+            microdata_products = self._extract_microdata_products(root)
+            if microdata_products:
+                products.extend(microdata_products)
+            
+            # Fallback: look for common product patterns
+            if not products:
+                products = self._extract_pattern_products(LexborHTMLParser(_page_text(root, raw)), url)
+                
         except Exception as e:
             logger.error(f"Failed to scrape products from {url}: {str(e)}")
         
         return products
     
-    def _extract_json_ld_products(self, soup: BeautifulSoup) -> List[Product]:
+    def _extract_json_ld_products(self, root: lxml.html.HtmlElement) -> List[Product]:
         """Extract products from JSON-LD structured data"""
         products = []
         
-        for script in soup.find_all('script', type='application/ld+json'):
+        for script in _JSON_LD_SCRIPTS(root):
             try:
-                data = json.loads(script.string)
+                # An empty script decodes as "", which fails like any bad blob
+                data = orjson.loads(script.text or '')
                 if isinstance(data, list):
                     data = data[0] if data else {}
                 
@@ -275,7 +675,7 @@ class WebsiteService:
                             if product:
                                 products.append(product)
                                 
-            except (json.JSONDecodeError, KeyError) as e:
+            except (orjson.JSONDecodeError, KeyError) as e:
                 logger.debug(f"Failed to parse JSON-LD: {str(e)}")
                 continue
         
@@ -298,22 +698,25 @@ class WebsiteService:
                 price = float(offers.get('price', 0))
                 currency = offers.get('priceCurrency', 'USD')
             
-            # Extract images
+            # Extract images, stopping once enough are collected
             images = []
             image_data = data.get('image', [])
             if isinstance(image_data, str):
                 images = [image_data]
             elif isinstance(image_data, list):
-                images = [img if isinstance(img, str) else img.get('url', '') for img in image_data]
+                images = list(islice(
+                    (img if isinstance(img, str) else img.get('url', '') for img in image_data),
+                    MAX_PRODUCT_IMAGES
+                ))
             
             if name:
                 return Product(
-                    id=f"scraped_{hash(name)}",
+                    id=f"scraped_{_stable_id(name)}",
                     name=self._sanitize_text(name),
                     description=self._sanitize_text(description),
                     price=price,
                     currency=currency,
-                    images=images[:3],  # Limit to 3 images
+                    images=images,
                     category=data.get('category', '')
                 )
                 
@@ -322,34 +725,30 @@ class WebsiteService:
         
         return None
     
-    def _extract_microdata_products(self, soup: BeautifulSoup) -> List[Product]:
+    def _extract_microdata_products(self, root: lxml.html.HtmlElement) -> List[Product]:
         """Extract products from microdata"""
         products = []
         
-        for item in soup.find_all(attrs={'itemtype': re.compile(r'.*Product')}):
+        for item in _MICRODATA_ITEMS(root):
             try:
-                name_elem = item.find(attrs={'itemprop': 'name'})
-                name = name_elem.get_text().strip() if name_elem else ''
+                name_elem = _ITEMPROP(item, prop='name')
+                name = name_elem[0].text_content().strip() if name_elem else ''
                 
-                desc_elem = item.find(attrs={'itemprop': 'description'})
-                description = desc_elem.get_text().strip() if desc_elem else ''
+                desc_elem = _ITEMPROP(item, prop='description')
+                description = desc_elem[0].text_content().strip() if desc_elem else ''
                 
-                price_elem = item.find(attrs={'itemprop': 'price'})
+                price_elem = _ITEMPROP(item, prop='price')
                 price = 0.0
                 if price_elem:
-                    price_text = price_elem.get('content') or price_elem.get_text()
-                    price = float(re.sub(r'[^\d.]', '', price_text)) if price_text else 0.0
+                    price_text = price_elem[0].get('content') or price_elem[0].text_content()
+                    price = float(_NON_NUMERIC_RE.sub('', price_text)) if price_text else 0.0
                 
                 # Extract images
-                images = []
-                for img in item.find_all('img', attrs={'itemprop': 'image'}):
-                    src = img.get('src')
-                    if src:
-                        images.append(src)
+                images = [src for src in _ITEMPROP_IMAGES(item) if src]
                 
                 if name:
                     products.append(Product(
-                        id=f"microdata_{hash(name)}",
+                        id=f"microdata_{_stable_id(name)}",
                         name=self._sanitize_text(name),
                         description=self._sanitize_text(description),
                         price=price,
@@ -363,72 +762,59 @@ class WebsiteService:
         
         return products
     
-    def _extract_pattern_products(self, soup: BeautifulSoup, base_url: str) -> List[Product]:
+    def _extract_pattern_products(self, tree: LexborHTMLParser, base_url: str) -> List[Product]:
         """Extract products using common HTML patterns"""
         products = []
         
-        # Look for common product containers
-        product_selectors = [
-            '.product', '.product-item', '.product-card',
-            '[data-product]', '.woocommerce-product',
-            '.shop-item', '.catalog-item'
-        ]
-        
-        for selector in product_selectors:
-            items = soup.select(selector)
-            if items:
-                for item in items[:10]:  # Limit to 10 items per pattern
-                    product = self._parse_pattern_product(item, base_url)
-                    if product:
-                        products.append(product)
-                break  # Use first successful pattern
+        # Look for common product containers, keeping only the first successful pattern
+        items = _lexbor_select(tree, _PRODUCT_SELECTORS)
+        if items:
+            ranks = [_lexbor_rank(_PRODUCT_SELECTORS, item) for item in items]
+            best = min(ranks)
+            matched = [item for item, rank in zip(items, ranks) if rank == best]
+            for item in matched[:10]:  # Limit to 10 items per pattern
+                product = self._parse_pattern_product(item, base_url)
+                if product:
+                    products.append(product)
         
         return products
     
-    def _parse_pattern_product(self, item: BeautifulSoup, base_url: str) -> Optional[Product]:
+    def _pattern_fields(self, item: LexborNode, selectors: Tuple[str, ...]) -> List[LexborNode]:
+        """Candidate elements for one field, in the order the selectors prefer them"""
+        nodes = _lexbor_select(item, selectors)
+        return _by_priority(nodes, [_lexbor_rank(selectors, node) for node in nodes])
+    
+    def _parse_pattern_product(self, item: LexborNode, base_url: str) -> Optional[Product]:
         """Parse product from HTML pattern"""
         try:
             # Extract name
-            name_selectors = ['h1', 'h2', 'h3', '.title', '.name', '.product-title']
-            name = ''
-            for selector in name_selectors:
-                name_elem = item.select_one(selector)
-                if name_elem:
-                    name = name_elem.get_text().strip()
-                    break
+            name_elems = self._pattern_fields(item, _NAME_SELECTORS)
+            name = name_elems[0].text(deep=True).strip() if name_elems else ''
             
             # Extract description
-            desc_selectors = ['.description', '.summary', '.excerpt', 'p']
-            description = ''
-            for selector in desc_selectors:
-                desc_elem = item.select_one(selector)
-                if desc_elem:
-                    description = desc_elem.get_text().strip()
-                    break
+            desc_elems = self._pattern_fields(item, _DESC_SELECTORS)
+            description = desc_elems[0].text(deep=True).strip() if desc_elems else ''
             
             # Extract price
-            price_selectors = ['.price', '.cost', '.amount', '[data-price]']
             price = 0.0
-            for selector in price_selectors:
-                price_elem = item.select_one(selector)
-                if price_elem:
-                    price_text = price_elem.get_text() or price_elem.get('data-price', '')
-                    price_match = re.search(r'[\d.]+', price_text)
-                    if price_match:
-                        price = float(price_match.group())
-                        break
+            for price_elem in self._pattern_fields(item, _PRICE_SELECTORS):
+                price_text = price_elem.text(deep=True) or price_elem.attributes.get('data-price') or ''
+                price_match = _DIGITS_RE.search(price_text)
+                if price_match:
+                    price = float(price_match.group())
+                    break
             
             # Extract images
             images = []
-            for img in item.find_all('img'):
-                src = img.get('src') or img.get('data-src')
+            for img in item.css('img'):
+                src = img.attributes.get('src') or img.attributes.get('data-src')
                 if src:
                     full_url = urljoin(base_url, src)
                     images.append(full_url)
             
             if name:
                 return Product(
-                    id=f"pattern_{hash(name)}",
+                    id=f"pattern_{_stable_id(name)}",
                     name=self._sanitize_text(name),
                     description=self._sanitize_text(description),
                     price=price,
@@ -444,26 +830,27 @@ class WebsiteService:
     def _parse_shopify_products(self, products_data: List[Dict[str, Any]]) -> List[Product]:
         """Parse Shopify products data"""
         products = []
+        # Bound once; these run for every product in the feed
+        sanitize = self._sanitize_text
+        append = products.append
         
         for product_data in products_data:
             try:
-                variants = product_data.get('variants', [])
+                variants = product_data.get('variants')
                 first_variant = variants[0] if variants else {}
                 
-                images = []
-                for img in product_data.get('images', []):
-                    if isinstance(img, dict):
-                        images.append(img.get('src', ''))
-                    else:
-                        images.append(str(img))
+                images = list(islice(
+                    (img.get('src', '') if isinstance(img, dict) else str(img) for img in product_data.get('images', ())),
+                    MAX_PRODUCT_IMAGES
+                ))
                 
-                products.append(Product(
+                append(Product(
                     id=str(product_data.get('id', '')),
-                    name=self._sanitize_text(product_data.get('title', '')),
-                    description=self._sanitize_text(product_data.get('body_html', '')),
+                    name=sanitize(product_data.get('title', '')),
+                    description=sanitize(product_data.get('body_html', '')),
                     price=float(first_variant.get('price', 0)),
                     currency='USD',
-                    images=images[:3],
+                    images=images,
                     category=product_data.get('product_type', '')
                 ))
                 
@@ -484,21 +871,22 @@ class WebsiteService:
     def _parse_woocommerce_products(self, products_data: List[Dict[str, Any]]) -> List[Product]:
         """Parse WooCommerce products data"""
         products = []
+        # Bound once; these run for every product in the feed
+        sanitize = self._sanitize_text
+        append = products.append
         
         for product_data in products_data:
             try:
-                images = []
-                for img in product_data.get('images', []):
-                    images.append(img.get('src', ''))
+                images = list(islice((img.get('src', '') for img in product_data.get('images', ())), MAX_PRODUCT_IMAGES))
                 
-                products.append(Product(
+                append(Product(
                     id=str(product_data.get('id', '')),
-                    name=self._sanitize_text(product_data.get('name', '')),
-                    description=self._sanitize_text(product_data.get('description', '')),
+                    name=sanitize(product_data.get('name', '')),
+                    description=sanitize(product_data.get('description', '')),
                     price=float(product_data.get('price', 0)),
                     currency='USD',
-                    images=images[:3],
-                    category=', '.join([cat.get('name', '') for cat in product_data.get('categories', [])])
+                    images=images,
+                    category=', '.join(cat.get('name', '') for cat in product_data.get('categories', ()))
                 ))
                 
             except (ValueError, TypeError) as e:
@@ -525,17 +913,29 @@ class WebsiteService:
         return domain
     
     def _sanitize_text(self, text: str) -> str:
-        """Sanitize HTML text content"""
+        """Reduce scraped HTML or text to HTML-escaped plain text"""
         if not text:
             return ""
         
-        # Remove HTML tags and sanitize
-        clean_text = bleach.clean(text, tags=self.allowed_tags, strip=True)
+        # Only markup or entities need a parse; plain text is used as-is
+        clean_text = text
+        if '<' in text or '&' in text:
+            try:
+                root = lxml.html.fromstring(text)
+            except (etree.ParserError, ValueError):
+                root = None
+            if root is not None:
+                # Pad block elements so adjacent paragraphs don't run together
+                for elem in root.iter(*_BLOCK_TAGS):
+                    elem.text = ' ' + elem.text if elem.text else ' '
+                    elem.tail = ' ' + elem.tail if elem.tail else ' '
+                clean_text = root.text_content()
         
         # Remove extra whitespace
-        clean_text = re.sub(r'\s+', ' ', clean_text).strip()
+        clean_text = _WS_RE.sub(' ', clean_text).strip()
         
-        return clean_text[:500]  # Limit length
+        # Limit length, then escape what text_content() decoded (e.g. &lt;script&gt;)
+        return escape(clean_text[:500], quote=False)
 
 # Global instance
 website_service = WebsiteService()
@@ -58,7 +58,7 @@ run_dev() {
     
     source .venv/bin/activate || .venv\Scripts\activate
     pip install -r requirements.txt
-    python -m uvicorn app.main:app --reload --host 0.0.0.0 --port 8000 &
+    python -m uvicorn app.main:app --reload --host 0.0.0.0 --port 8000 --loop uvloop --http httptools &
     BACKEND_PID=$!
     cd ..
     
@@ -110,7 +110,7 @@ run_prod() {
     cd backend
     source .venv/bin/activate || .venv\Scripts\activate
     pip install -r requirements.txt
-    python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 &
+    python -m uvicorn app.main:app --host 0.0.0.0 --port 8000 --loop uvloop --http httptools &
     BACKEND_PID=$!
     cd ..
     